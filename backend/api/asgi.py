@@ -0,0 +1,534 @@
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import copy_context
+from datetime import timezone
+from functools import partial
+from itertools import count
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.http import HttpRequest, HttpResponse, QueryDict
+from items.models import History, Item, PropagationJob
+from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
+
+from .cache import (
+    get_cached_response, get_node_etag, get_node_version, set_cached_response
+)
+from .middleware import (
+    QueryTimer, get_server_timing, observe_request, query_timer
+)
+from .pagination import KeysetPagination
+from .propagation import POLL_INTERVAL, drain_jobs, get_job_token
+from .renderers import TreeRenderer, render_json
+from .serializers import HistorySerializer, ItemSerializer
+from .services import (
+    SUBTREE_CHUNK_SIZE, check_validators, get_datetime_object,
+    get_history_etag, get_history_item, get_history_queryset, get_subtree_sql,
+    get_updates_queryset, merge_history, read_history_archive, set_validators
+)
+from .validators import parse_flag, validate_date, validate_uuid
+
+PARAM_PATTERN = re.compile(r'%([s%])')
+
+# Пулы asyncpg процесса, для метрик.
+async_databases = []
+
+
+class AsyncStreamingResponse(HttpResponse):
+    """
+    Ответ, тело которого отдается частями из асинхронного итератора.
+    """
+    streaming = True
+
+    def __init__(self, content, **kwargs):
+        super().__init__(**kwargs)
+        self.async_content = content
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        render_json(data),
+        status=status,
+        content_type='application/json',
+    )
+
+
+def validation_error():
+    return json_response(
+        {'code': HTTP_400_BAD_REQUEST, 'message': 'Validation Failed'},
+        status=HTTP_400_BAD_REQUEST,
+    )
+
+
+def item_not_found():
+    return json_response(
+        {'code': HTTP_404_NOT_FOUND, 'message': 'Item not found'},
+        status=HTTP_404_NOT_FOUND,
+    )
+
+
+def render_page(serializer_class, rows, pagination):
+    """
+    Сериализует и рендерит страницу ответа /updates или /history.
+    """
+    serializer = serializer_class(rows, many=True)
+    return render_json(pagination.get_response_data(serializer.data))
+
+
+def build_request(scope):
+    """
+    Собирает HttpRequest из ASGI scope, чтобы переиспользовать
+    пагинацию и проверку условных заголовков синхронных представлений.
+    """
+    request = HttpRequest()
+    request.method = scope['method']
+    request.path = request.path_info = scope['path']
+    request.GET = QueryDict(scope.get('query_string', b'').decode('latin-1'))
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        request.META[f'HTTP_{name}'] = value.decode('latin-1')
+    return request
+
+
+def run_sync(func, *args):
+    """
+    Выполняет блокирующую функцию (кэш, файлы архива, рендеринг)
+    в пуле потоков с контекстом текущего запроса.
+    """
+    loop = asyncio.get_event_loop()
+    return loop.run_in_executor(None, partial(copy_context().run, func, *args))
+
+
+def call_with_connection(func, *args):
+    """
+    Выполняет в потоке пула функцию, работающую с базой через ORM,
+    и закрывает соединение потока. Запросы учитываются в метриках
+    текущего запроса.
+    """
+    timer = query_timer.get()
+    try:
+        if timer is None:
+            return func(*args)
+        with connection.execute_wrapper(timer):
+            return func(*args)
+    finally:
+        connection.close()
+
+
+def measure_query():
+    """
+    Учитывает запрос asyncpg в метриках текущего запроса.
+    """
+    timer = query_timer.get()
+    return nullcontext() if timer is None else timer.measure()
+
+
+def to_asyncpg_sql(sql):
+    """
+    Заменяет параметры %s в SQL на нумерованные параметры asyncpg.
+    """
+    numbers = count(1)
+    return PARAM_PATTERN.sub(
+        lambda match: (
+            '%' if match.group(1) == '%' else f'${next(numbers)}'
+        ),
+        sql,
+    )
+
+
+def compile_queryset(queryset):
+    """
+    Компилирует запрос ORM в SQL и параметры для asyncpg.
+    """
+    sql, params = queryset.query.sql_with_params()
+    return to_asyncpg_sql(sql), params
+
+
+class AsyncDatabase:
+    """
+    Пул соединений asyncpg к базе данных default. Размер и время
+    ожидания берутся из тех же настроек POOL, что и у синхронного пула;
+    asyncpg сам проверяет и переоткрывает закрытые соединения.
+    """
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self.pool = None
+        self.lock = None
+        self.stats = dict.fromkeys(('checkouts', 'waits'), 0)
+        self.stats['wait_time'] = 0.0
+        async_databases.append(self)
+
+    async def get_pool(self):
+        if self.pool is not None:
+            return self.pool
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.pool is None:
+                import asyncpg
+
+                database = settings.DATABASES[self.alias]
+                self.pool = await asyncpg.create_pool(
+                    host=database['HOST'] or None,
+                    port=int(database['PORT']) if database['PORT'] else None,
+                    user=database['USER'],
+                    password=database['PASSWORD'],
+                    database=database['NAME'],
+                    min_size=1,
+                    max_size=database.get('POOL', {}).get('SIZE', 10),
+                    max_inactive_connection_lifetime=database.get(
+                        'POOL', {},
+                    ).get('CHECK_INTERVAL', 30),
+                )
+        return self.pool
+
+    @asynccontextmanager
+    async def acquire(self):
+        pool = await self.get_pool()
+        waited = (
+            pool.get_idle_size() == 0
+            and pool.get_size() >= pool.get_max_size()
+        )
+        started = time.monotonic()
+        timeout = settings.DATABASES[self.alias].get('POOL', {}).get(
+            'TIMEOUT', 10,
+        )
+        async with pool.acquire(timeout=timeout) as connection:
+            self.stats['checkouts'] += 1
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_time'] += time.monotonic() - started
+            yield connection
+
+    async def fetch(self, sql, *params):
+        async with self.acquire() as connection:
+            with measure_query():
+                return await connection.fetch(sql, *params)
+
+    async def fetchrow(self, sql, *params):
+        async with self.acquire() as connection:
+            with measure_query():
+                return await connection.fetchrow(sql, *params)
+
+    async def fetch_objects(self, queryset):
+        """
+        Выполняет запрос ORM и возвращает список объектов модели;
+        аннотации запроса становятся атрибутами объектов.
+        """
+        sql, params = compile_queryset(queryset)
+        rows = await self.fetch(sql, *params)
+        model = queryset.model
+        fields = {field.attname for field in model._meta.concrete_fields}
+        objects = []
+        for row in rows:
+            values = dict(row)
+            annotations = {
+                name: values.pop(name) for name in values.keys() - fields
+            }
+            instance = model(**values)
+            instance.__dict__.update(annotations)
+            objects.append(instance)
+        return objects
+
+    async def iterate(self, sql, *params, chunk_size=SUBTREE_CHUNK_SIZE):
+        """
+        Выдает строки запроса порциями через серверный курсор.
+        """
+        async with self.acquire() as connection:
+            async with connection.transaction(readonly=True):
+                with measure_query():
+                    cursor = await connection.cursor(sql, *params)
+                while True:
+                    rows = await cursor.fetch(chunk_size)
+                    if not rows:
+                        return
+                    yield rows
+
+    def get_stats(self):
+        if self.pool is None:
+            return None
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {
+            'size': self.pool.get_max_size(),
+            'opened': size,
+            'idle': idle,
+            'in_use': size - idle,
+            **self.stats,
+        }
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+
+class AsyncAPI:
+    """
+    ASGI-приложение: чтение /nodes, /updates и /history выполняется
+    асинхронно через asyncpg, остальные запросы передаются
+    WSGI-приложению. Без PostgreSQL все запросы идут в WSGI-приложение.
+    Запросы к базе строятся теми же функциями, что и в представлениях,
+    метрики записываются так же, как в MetricsMiddleware.
+    """
+    routes = (
+        ('GET', re.compile(r'^/nodes/(?P<uuid>[-\w]+)$'), 'get_item'),
+        ('GET', re.compile(r'^/updates$'), 'get_updates'),
+        (
+            'GET',
+            re.compile(r'^/node/(?P<uuid>[-\w]+)/history$'),
+            'get_history',
+        ),
+    )
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.database = AsyncDatabase()
+        self.enabled = connection.vendor == 'postgresql'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and self.enabled:
+            for method, pattern, name in self.routes:
+                match = pattern.match(scope['path'])
+                if match and scope['method'] == method:
+                    return await self.handle(
+                        scope, send, name, match.groupdict(),
+                    )
+        return await self.fallback(scope, receive, send)
+
+    async def handle(self, scope, send, name, kwargs):
+        """
+        Обрабатывает запрос асинхронным представлением и записывает
+        метрики запроса.
+        """
+        timer = QueryTimer()
+        query_timer.set(timer)
+        started = time.perf_counter()
+        request = build_request(scope)
+        response = await getattr(self, name)(request, **kwargs)
+        labels = name, request.method, response.status_code
+        if response.streaming:
+            response.async_content = self.stream(
+                response.async_content, labels, timer, started,
+            )
+        else:
+            duration = observe_request(
+                labels, timer, started, len(response.content),
+            )
+            if settings.SERVER_TIMING:
+                response['Server-Timing'] = get_server_timing(
+                    timer, duration,
+                )
+        await self.send_response(send, response)
+
+    async def stream(self, content, labels, timer, started):
+        """
+        Отдает потоковый ответ; метрики записываются, когда ответ отдан
+        или прерван.
+        """
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            observe_request(labels, timer, started, size)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.database.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def send_response(self, send, response):
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (key.lower().encode('latin-1'), value.encode('latin-1'))
+                for key, value in response.items()
+            ],
+        })
+        if not response.streaming:
+            await send({
+                'type': 'http.response.body', 'body': response.content,
+            })
+            return
+        content = response.async_content
+        try:
+            async for chunk in content:
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        finally:
+            await content.aclose()
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_for_job(self, token):
+        """
+        Асинхронный вариант propagation.wait_for_job.
+        """
+        if token is None:
+            return
+        deadline = time.monotonic() + settings.PROPAGATION_WAIT_TIMEOUT
+        sql, params = compile_queryset(
+            PropagationJob.objects.filter(pk=token).values_list('pk'),
+        )
+        while await self.database.fetchrow(sql, *params):
+            if time.monotonic() >= deadline:
+                await run_sync(call_with_connection, drain_jobs, token)
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def iter_subtree(self, uuid, aggregates):
+        """
+        Выдает строки поддерева элемента порциями, как iter_subtree_rows.
+        """
+        sql = to_asyncpg_sql(get_subtree_sql('postgresql', aggregates))
+        return self.database.iterate(sql, Item._meta.pk.to_python(uuid))
+
+    async def render_subtree(self, chunks, renderer, rows):
+        """
+        Рендерит поддерево в пуле потоков, начиная с уже прочитанной
+        порции rows.
+        """
+        try:
+            yield await run_sync(renderer.render, rows)
+            async for rows in chunks:
+                yield await run_sync(renderer.render, rows)
+            yield renderer.close()
+        finally:
+            await chunks.aclose()
+
+    async def open_subtree(self, uuid, aggregates):
+        """
+        Начинает чтение поддерева элемента. Возвращает итератор порций
+        строк и первую порцию либо None, если элемента нет.
+        """
+        chunks = self.iter_subtree(uuid, aggregates)
+        try:
+            return chunks, await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def stream_item(self, request, uuid, etag, aggregates):
+        """
+        Отдает поддерево элемента потоком, без кэширования тела ответа.
+        """
+        subtree = await self.open_subtree(uuid, aggregates)
+        if subtree is None:
+            return item_not_found()
+        chunks, rows = subtree
+        date = rows[0][3]
+        not_modified = check_validators(request, etag, date)
+        if not_modified:
+            await chunks.aclose()
+            return not_modified
+        response = AsyncStreamingResponse(
+            self.render_subtree(chunks, TreeRenderer(aggregates), rows),
+            content_type='application/json',
+        )
+        return set_validators(response, etag, date)
+
+    async def get_item(self, request, uuid):
+        try:
+            validate_uuid(uuid)
+            aggregates = parse_flag(request.GET.get('aggregates'))
+            token = get_job_token(request)
+        except ValidationError:
+            return validation_error()
+        await self.wait_for_job(token)
+        version = await run_sync(get_node_version, uuid)
+        if aggregates:
+            version = f'{version}-aggregates'
+        etag = get_node_etag(uuid, version)
+        not_modified = check_validators(request, etag)
+        if not_modified:
+            return not_modified
+        if settings.NODES_STREAMING:
+            return await self.stream_item(request, uuid, etag, aggregates)
+        cached = await run_sync(get_cached_response, uuid, version)
+        if cached is None:
+            subtree = await self.open_subtree(uuid, aggregates)
+            if subtree is None:
+                return item_not_found()
+            chunks, rows = subtree
+            content = self.render_subtree(
+                chunks, TreeRenderer(aggregates), rows,
+            )
+            cached = b''.join([part async for part in content]), rows[0][3]
+            await run_sync(set_cached_response, uuid, version, *cached)
+        content, date = cached
+        not_modified = check_validators(request, etag, date)
+        if not_modified:
+            return not_modified
+        response = HttpResponse(content, content_type='application/json')
+        return set_validators(response, etag, date)
+
+    async def get_updates(self, request):
+        date = request.GET.get('date')
+        try:
+            validate_date(date)
+            pagination = KeysetPagination(request, Item)
+            token = get_job_token(request)
+        except ValidationError:
+            return validation_error()
+        await self.wait_for_job(token)
+        items = await self.database.fetch_objects(
+            get_updates_queryset(date, pagination),
+        )
+        if pagination.enabled:
+            items = pagination.get_page(items)
+        content = await run_sync(
+            render_page, ItemSerializer, items, pagination,
+        )
+        return HttpResponse(content, content_type='application/json')
+
+    async def get_history(self, request, uuid):
+        try:
+            validate_uuid(uuid)
+            validate_date(request.GET.get('dateStart'))
+            validate_date(request.GET.get('dateEnd'))
+            pagination = KeysetPagination(request, History)
+            token = get_job_token(request)
+        except ValidationError:
+            return validation_error()
+        await self.wait_for_job(token)
+        items = await self.database.fetch_objects(get_history_item(uuid))
+        if not items:
+            return item_not_found()
+        item = items[0]
+        etag = get_history_etag(item)
+        not_modified = check_validators(request, etag, item.date)
+        if not_modified:
+            return not_modified
+        date_start, date_end = (
+            get_datetime_object(request.GET.get(name)).replace(
+                tzinfo=timezone.utc,
+            )
+            for name in ('dateStart', 'dateEnd')
+        )
+        archived = await run_sync(
+            call_with_connection, read_history_archive,
+            item.id, date_start, date_end, pagination,
+        )
+        live = await self.database.fetch_objects(get_history_queryset(
+            item.id, date_start, date_end, pagination, archived,
+        ))
+        history = merge_history(pagination, archived, live)
+        content = await run_sync(
+            render_page, HistorySerializer, history, pagination,
+        )
+        response = HttpResponse(content, content_type='application/json')
+        return set_validators(response, etag, item.date)
@@ -0,0 +1,126 @@
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+VERSION_KEY = 'nodes:version:{}'
+RESPONSE_KEY = 'nodes:response:{}:{}'
+HITS_KEY = 'nodes:stats:hits'
+MISSES_KEY = 'nodes:stats:misses'
+INVALIDATE_CHUNK_SIZE = 1000
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def get_cache():
+    """
+    Возвращает кэш для ответов /nodes.
+    """
+    return caches[settings.NODES_CACHE_ALIAS]
+
+
+def is_process_local():
+    """
+    Проверяет, хранится ли кэш ответов /nodes в памяти процесса. Такой
+    кэш не общий для воркеров: версии поддеревьев и ETag у каждого
+    воркера свои, а сброс версий не доходит до других процессов.
+    """
+    backend = settings.CACHES[settings.NODES_CACHE_ALIAS]['BACKEND']
+    return backend in PROCESS_LOCAL_BACKENDS
+
+
+def check_shared_cache(workers=1):
+    """
+    Запрещает кэш в памяти процесса, если с кэшем /nodes работают
+    несколько процессов: воркеры gunicorn или воркер очереди пересчета
+    (PROPAGATION_QUEUE), который сбрасывает версии поддеревьев.
+    """
+    if is_process_local() and (workers > 1 or settings.PROPAGATION_QUEUE):
+        raise ImproperlyConfigured(
+            'Для нескольких процессов нужен общий кэш (CACHE_BACKEND)'
+        )
+
+
+def normalize_id(item_id):
+    """
+    Приводит id элемента к единому виду для ключей кэша.
+    """
+    return str(UUID(str(item_id)))
+
+
+def count(key):
+    """
+    Увеличивает счетчик в кэше (общий для всех воркеров).
+    """
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_node_version(item_id):
+    """
+    Возвращает текущую версию поддерева элемента. Версия меняется при
+    любом изменении элемента или его потомков.
+    """
+    cache = get_cache()
+    key = VERSION_KEY.format(normalize_id(item_id))
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        version = cache.get(key, uuid4().hex)
+    return version
+
+
+def get_cached_response(item_id, version):
+    """
+    Возвращает сохраненные для версии поддерева тело ответа и дату
+    элемента в виде (content, date) или None.
+    """
+    cached = get_cache().get(
+        RESPONSE_KEY.format(normalize_id(item_id), version),
+    )
+    count(MISSES_KEY if cached is None else HITS_KEY)
+    return cached
+
+
+def set_cached_response(item_id, version, content, date):
+    """
+    Сохраняет тело ответа и дату элемента для версии поддерева.
+    """
+    get_cache().set(
+        RESPONSE_KEY.format(normalize_id(item_id), version),
+        (content, date),
+        timeout=settings.NODES_CACHE_TIMEOUT,
+    )
+
+
+def get_node_etag(item_id, version):
+    """
+    Возвращает строгий ETag поддерева элемента.
+    """
+    return f'"{normalize_id(item_id)}-{version}"'
+
+
+def invalidate_nodes(items_ids):
+    """
+    Сбрасывает версии поддеревьев элементов. Ответы, сохраненные
+    для старых версий, больше не используются.
+    """
+    cache = get_cache()
+    keys = [VERSION_KEY.format(normalize_id(item_id)) for item_id in items_ids]
+    for start in range(0, len(keys), INVALIDATE_CHUNK_SIZE):
+        cache.delete_many(keys[start:start + INVALIDATE_CHUNK_SIZE])
+
+
+def get_cache_stats():
+    """
+    Возвращает счетчики попаданий и промахов кэша ответов /nodes.
+    """
+    stats = get_cache().get_many((HITS_KEY, MISSES_KEY))
+    return {
+        'hits': stats.get(HITS_KEY, 0),
+        'misses': stats.get(MISSES_KEY, 0),
+    }
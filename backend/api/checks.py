@@ -0,0 +1,17 @@
+from django.core.checks import Error, Tags, register
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache import check_shared_cache
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Не дает запустить команды (в том числе воркер очереди пересчета)
+    с кэшем /nodes, который не виден другим процессам.
+    """
+    try:
+        check_shared_cache()
+    except ImproperlyConfigured as error:
+        return [Error(str(error), id='api.E001')]
+    return []
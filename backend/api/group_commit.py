@@ -0,0 +1,150 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import invalidate_nodes
+from .metrics import IMPORT_GROUP_SIZE
+from .propagation import (
+    apply_payloads, build_payload, drain_jobs, enqueue_propagation,
+    has_existing_folders, needs_drain
+)
+from .serializers import ItemRequestImportSerializer
+
+
+class ImportRejected(Exception):
+    """
+    Импорт отклонен при записи (ответ 400 для своего запроса).
+    """
+
+
+class ImportGroup:
+    """
+    Запросы /imports, записываемые одной транзакцией.
+    """
+    def __init__(self):
+        self.requests = []
+        self.results = None
+        self.error = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class GroupCommitter:
+    """
+    Групповая запись импортов. Первый запрос группы становится ведущим:
+    он ждет window секунд (или пока в группе не наберется max_size
+    запросов), после чего записывает все запросы группы одной
+    транзакцией. Остальные запросы ждут результата своей записи.
+    Пока ведущий пишет, следующие запросы собираются в новую группу.
+    Если общий проход группы не удался, каждый запрос записывается
+    отдельно, и отклоняется только тот, чья запись не удалась.
+    """
+    def __init__(self, window=None, max_size=None):
+        self.window = window
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.group = None
+
+    def submit(self, validated_data):
+        """
+        Записывает импорт в составе группы. Возвращает задание очереди
+        пересчета (или None) либо вызывает ImportRejected.
+        """
+        window = self.window
+        if window is None:
+            window = settings.IMPORT_GROUP_WINDOW
+        max_size = self.max_size or settings.IMPORT_GROUP_MAX_SIZE
+        with self.lock:
+            group = self.group
+            leader = group is None
+            if leader:
+                group = self.group = ImportGroup()
+            index = len(group.requests)
+            group.requests.append(validated_data)
+            if len(group.requests) >= max_size:
+                self.group = None
+                group.full.set()
+        if leader:
+            group.full.wait(window)
+            with self.lock:
+                if self.group is group:
+                    self.group = None
+            try:
+                group.results = commit_requests(group.requests)
+            except Exception as error:
+                group.error = error
+            finally:
+                group.done.set()
+        else:
+            group.done.wait()
+        if group.error is not None:
+            raise group.error
+        result = group.results[index]
+        if isinstance(result, Exception):
+            raise ImportRejected from result
+        return result
+
+
+def commit_requests(requests):
+    """
+    Записывает импорты группой, а если общий проход не удался, то
+    каждый импорт отдельной транзакцией. Возвращает результаты
+    commit_group; импорт, который не удалось записать и отдельно,
+    получает вместо результата свое исключение.
+    """
+    IMPORT_GROUP_SIZE.observe(len(requests))
+    try:
+        return commit_group(requests)
+    except Exception as error:
+        if len(requests) == 1:
+            return [error]
+    results = []
+    for validated_data in requests:
+        try:
+            results.extend(commit_group([validated_data]))
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+def commit_group(requests):
+    """
+    Записывает импорты одной транзакцией, каждый в своей точке
+    сохранения: ошибка одного импорта откатывает только его. Даты,
+    размеры и история предков пересчитываются одним проходом на всю
+    группу. Возвращает для каждого запроса задание очереди пересчета
+    (None без очереди) или исключение, с которым импорт отклонен.
+    """
+    serializer = ItemRequestImportSerializer()
+    results, payloads, affected = [], [], set()
+    with transaction.atomic():
+        for validated_data in requests:
+            items = validated_data.get('items')
+            date = validated_data.get('updateDate')
+            # Размеры папок в базе должны учитывать предыдущие импорты
+            # группы до того, как папку можно будет переместить.
+            if payloads and has_existing_folders(items):
+                affected.update(apply_payloads(payloads))
+                payloads = []
+            if settings.PROPAGATION_QUEUE and needs_drain(items):
+                drain_jobs()
+            try:
+                with transaction.atomic():
+                    instance = serializer.create(validated_data)
+            except Exception as error:
+                results.append(error)
+                continue
+            affected.update(instance.affected_ids)
+            if settings.PROPAGATION_QUEUE:
+                results.append(enqueue_propagation(instance, items, date))
+            else:
+                payloads.append((date, build_payload(instance, items)))
+                results.append(None)
+        if payloads:
+            affected.update(apply_payloads(payloads))
+    invalidate_nodes(affected)
+    return results
+
+
+group_committer = GroupCommitter()
@@ -0,0 +1,46 @@
+import time
+
+from api.propagation import process_jobs
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрабатывает очередь отложенного пересчета дат, размеров '
+        'и истории предков после импорта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.PROPAGATION_BATCH_SIZE,
+            help='Количество заданий, объединяемых в один проход.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0.5,
+            help='Пауза при пустой очереди, секунд.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        try:
+            while True:
+                count = process_jobs(options['batch_size'])
+                processed += count
+                if count:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Обработано заданий: {processed}')
@@ -0,0 +1,149 @@
+import os
+
+from django.db import connections
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram,
+    generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .cache import get_cache_stats
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'),
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf'))
+SIZE_BUCKETS = tuple(4 ** power * 256 for power in range(10)) + (
+    float('inf'),
+)
+
+REQUEST_LATENCY = Histogram(
+    'ya_disk_request_duration_seconds',
+    'Время обработки запроса',
+    ('view', 'method', 'status'),
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'ya_disk_db_queries',
+    'Число запросов к базе данных на один запрос',
+    ('view',),
+    buckets=COUNT_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'ya_disk_db_duration_seconds',
+    'Время запросов к базе данных на один запрос',
+    ('view',),
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'ya_disk_response_size_bytes',
+    'Размер тела ответа',
+    ('view',),
+    buckets=SIZE_BUCKETS,
+)
+IMPORT_BATCH_SIZE = Histogram(
+    'ya_disk_import_batch_size',
+    'Число элементов в запросе /imports',
+    buckets=COUNT_BUCKETS,
+)
+IMPORT_GROUP_SIZE = Histogram(
+    'ya_disk_import_group_size',
+    'Число запросов /imports, записанных одной транзакцией',
+    buckets=COUNT_BUCKETS,
+)
+
+
+class NodesCacheCollector:
+    """
+    Счетчики попаданий и промахов кэша /nodes. Хранятся в самом кэше,
+    поэтому уже общие для всех воркеров.
+    """
+    def collect(self):
+        stats = get_cache_stats()
+        metric = CounterMetricFamily(
+            'ya_disk_nodes_cache_requests',
+            'Обращения к кэшу ответов /nodes',
+            labels=('result',),
+        )
+        metric.add_metric(('hit',), stats['hits'])
+        metric.add_metric(('miss',), stats['misses'])
+        yield metric
+
+
+class RegistryProxy:
+    """
+    Метрики процесса из глобального реестра (без multiprocess-режима).
+    """
+    def collect(self):
+        return REGISTRY.collect()
+
+
+class DatabasePoolCollector:
+    """
+    Состояние пулов соединений процесса: синхронного (бэкенд
+    postgresql_pool) и asyncpg. В multiprocess-режиме показывает
+    воркер, обработавший запрос /metrics.
+    """
+    gauges = ('size', 'opened', 'idle', 'in_use')
+    counters = ('checkouts', 'waits', 'wait_time', 'timeouts', 'created',
+                'discarded')
+
+    def get_pools_stats(self):
+        from .asgi import async_databases
+
+        for alias in connections:
+            get_pool_stats = getattr(
+                connections[alias], 'get_pool_stats', None,
+            )
+            stats = get_pool_stats() if get_pool_stats else None
+            if stats:
+                yield alias, 'sync', stats
+        for database in async_databases:
+            stats = database.get_stats()
+            if stats:
+                yield database.alias, 'async', stats
+
+    def collect(self):
+        labels = ('alias', 'kind')
+        metrics = {
+            name: GaugeMetricFamily(
+                f'ya_disk_db_pool_{name}',
+                f'Пул соединений: {name}',
+                labels=labels,
+            ) for name in self.gauges
+        }
+        metrics.update({
+            name: CounterMetricFamily(
+                f'ya_disk_db_pool_{name}',
+                f'Пул соединений: {name}',
+                labels=labels,
+            ) for name in self.counters
+        })
+        for alias, kind, stats in self.get_pools_stats():
+            for name, value in stats.items():
+                if name in metrics:
+                    metrics[name].add_metric((alias, kind), value)
+        yield from metrics.values()
+
+
+def get_registry():
+    """
+    Возвращает реестр метрик. Под gunicorn с PROMETHEUS_MULTIPROC_DIR
+    метрики собираются из файлов всех воркеров.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = CollectorRegistry()
+        registry.register(RegistryProxy())
+    registry.register(NodesCacheCollector())
+    registry.register(DatabasePoolCollector())
+    return registry
+
+
+def render_metrics():
+    """
+    Метрики в текстовом формате Prometheus и их content type.
+    """
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import DB_DURATION, DB_QUERIES, REQUEST_LATENCY, RESPONSE_SIZE
+
+
+class QueryTimer:
+    """
+    Обертка execute_wrapper: число запросов и суммарное время в базе.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.measure():
+            return execute(sql, params, many, context)
+
+    @contextmanager
+    def measure(self):
+        """
+        Учитывает один запрос к базе, выполняемый внутри блока.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+# Счетчик запросов текущего запроса ASGI-приложения, которое
+# обращается к базе в обход execute_wrapper.
+query_timer = ContextVar('query_timer', default=None)
+
+
+def observe_request(labels, timer, started, size):
+    """
+    Записывает метрики запроса и возвращает время его обработки.
+    labels - (представление, метод, статус ответа).
+    """
+    duration = time.perf_counter() - started
+    view = labels[0]
+    REQUEST_LATENCY.labels(*labels).observe(duration)
+    DB_QUERIES.labels(view).observe(timer.count)
+    DB_DURATION.labels(view).observe(timer.duration)
+    RESPONSE_SIZE.labels(view).observe(size)
+    return duration
+
+
+def get_server_timing(timer, duration):
+    """
+    Значение заголовка Server-Timing: время в базе и остальной обработки.
+    """
+    return (
+        f'db;desc="database";dur={timer.duration * 1000:.2f}, '
+        f'app;desc="serialization";'
+        f'dur={(duration - timer.duration) * 1000:.2f}, '
+        f'total;dur={duration * 1000:.2f}'
+    )
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики Prometheus по каждому запросу: время обработки,
+    число и время запросов к базе, размер ответа. При SERVER_TIMING
+    добавляет заголовок Server-Timing с разбивкой времени на базу
+    и остальную обработку (сериализацию). Метрики потокового ответа
+    записываются после его отдачи с учетом запросов, выполненных
+    во время отдачи; заголовок Server-Timing к нему не добавляется,
+    так как заголовки отправляются раньше тела.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unknown'
+        labels = view, request.method, response.status_code
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, labels, timer, started,
+            )
+            return response
+        duration = observe_request(
+            labels, timer, started, len(response.content),
+        )
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = get_server_timing(timer, duration)
+        return response
+
+    def stream(self, content, labels, timer, started):
+        """
+        Отдает потоковый ответ, учитывая запросы к базе во время его
+        генерации. Метрики записываются, когда ответ отдан или закрыт.
+        """
+        size = 0
+        try:
+            with connection.execute_wrapper(timer):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            observe_request(labels, timer, started, size)
@@ -0,0 +1,96 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPagination:
+    """
+    Постраничная выдача по ключу (date, id). Включается параметром limit,
+    следующая страница запрашивается по непрозрачному курсору из поля next.
+    Стоимость запроса страницы не зависит от ее номера.
+    """
+    def __init__(self, request, model):
+        self.model = model
+        self.limit = request.GET.get('limit')
+        self.cursor = None
+        self.next = None
+        if self.limit is None:
+            return
+        try:
+            self.limit = int(self.limit)
+        except ValueError:
+            raise ValidationError('Недопустимое значение limit')
+        if not 0 < self.limit <= settings.MAX_PAGE_LIMIT:
+            raise ValidationError('Недопустимое значение limit')
+        cursor = request.GET.get('cursor')
+        if cursor:
+            self.cursor = self.decode_cursor(cursor)
+
+    @property
+    def enabled(self):
+        return self.limit is not None
+
+    def encode_cursor(self, row):
+        """
+        Кодирует ключ (date, id) записи в курсор.
+        """
+        value = f'{row.date.isoformat()}|{row.pk}'.encode()
+        return urlsafe_b64encode(value).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Раскодирует курсор в ключ (date, id).
+        """
+        try:
+            value = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            date, pk = value.decode().split('|')
+            date = datetime.fromisoformat(date)
+            pk = self.model._meta.pk.to_python(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise ValidationError('Недопустимый курсор')
+        if date.tzinfo is None:
+            raise ValidationError('Недопустимый курсор')
+        return date, pk
+
+    def filter_queryset(self, queryset):
+        """
+        Оставляет записи после курсора в порядке (date, id).
+        """
+        if self.cursor is not None:
+            date, pk = self.cursor
+            queryset = queryset.filter(
+                Q(date__gt=date) | Q(date=date, pk__gt=pk),
+            )
+        return queryset.order_by('date', 'pk')
+
+    def filter_rows(self, rows):
+        """
+        То же для записей в памяти.
+        """
+        rows = sorted(rows, key=lambda row: (row.date, row.pk))
+        if self.cursor is None:
+            return rows
+        return [row for row in rows if (row.date, row.pk) > self.cursor]
+
+    def get_page(self, rows):
+        """
+        Возвращает страницу из limit + 1 записей и запоминает курсор
+        следующей страницы, если она есть.
+        """
+        if len(rows) > self.limit:
+            self.next = self.encode_cursor(rows[self.limit - 1])
+        return rows[:self.limit]
+
+    def get_response_data(self, items):
+        """
+        Формирует тело ответа; поле next добавляется только
+        при постраничной выдаче.
+        """
+        data = {'items': items}
+        if self.enabled:
+            data['next'] = self.next
+        return data
@@ -0,0 +1,45 @@
+import codecs
+import re
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from .renderers import ORJSONRenderer
+
+# Числа из 19 и более цифр могут не поместиться в 64 бита.
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSON-парсер на orjson. Тело, которое orjson не принимает или
+    разбирает иначе (целые числа больше 64 бит orjson превращает
+    во float), разбирается стандартным json, поэтому результат
+    разбора не меняется.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        content = stream.read() if stream is not None else b''
+        if codecs.lookup(encoding).name != 'utf-8':
+            try:
+                content = content.decode(encoding).encode()
+            except UnicodeError as exc:
+                raise ParseError(f'JSON parse error - {exc}')
+        if not LONG_NUMBER.search(content):
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                pass
+        try:
+            return json.loads(
+                content,
+                parse_constant=json.strict_constant if self.strict else None,
+            )
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,216 @@
+import json
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from items.models import FOLDER, Item, ItemClosure, PropagationJob
+
+from .cache import invalidate_nodes
+from .services import (
+    save_updated_items_in_history, update_descendant_dates, update_sizes
+)
+
+JOB_HEADER = 'X-Propagation-Job'
+POLL_INTERVAL = 0.05
+
+
+def to_str(value):
+    return str(value) if value is not None else None
+
+
+def build_payload(instance, items):
+    """
+    Собирает данные пересчета для импорта, уже записанного
+    ItemRequestImportSerializer.create.
+    """
+    return {
+        'items': [
+            [to_str(item['id']), to_str(item.get('parent'))]
+            for item in items
+        ],
+        'deltas': [
+            [to_str(folder_id), *delta]
+            for folder_id, delta in instance.size_deltas.items()
+        ],
+        'abandoned': [to_str(pk) for pk in instance.abandoned_folders],
+        'moved_parents': [to_str(pk) for pk in instance.moved_parents],
+        'affected': [to_str(pk) for pk in instance.affected_ids],
+    }
+
+
+def enqueue_propagation(instance, items, date):
+    """
+    Ставит в очередь пересчет дат, размеров и истории предков импорта.
+    Возвращает задание, его номер служит токеном ожидания.
+    """
+    return PropagationJob.objects.create(
+        date=date, payload=json.dumps(build_payload(instance, items)),
+    )
+
+
+def has_existing_folders(items):
+    """
+    Проверяет, есть ли в импорте уже существующие папки. Размер
+    и счетчики перемещаемой папки берутся из базы, поэтому отложенные
+    приращения ее потомков нужно применить до такого импорта.
+    """
+    folders_ids = [item['id'] for item in items if item['type'] == FOLDER]
+    return (
+        bool(folders_ids)
+        and Item.objects.filter(pk__in=folders_ids).exists()
+    )
+
+
+def needs_drain(items):
+    """
+    Проверяет, нужно ли перед импортом применить очередь.
+    """
+    return has_existing_folders(items) and PropagationJob.objects.exists()
+
+
+def update_ancestors_dates(dated_parents):
+    """
+    Обновляет даты предков папок из списка (id папки, дата) в порядке
+    импортов. Каждый предок обновляется один раз: он получает дату
+    последнего затронувшего его импорта и наибольшую из дат в качестве
+    последней даты поддерева. Предки загружаются одним запросом.
+    """
+    last, latest = {}, {}
+    for index, (parent_id, date) in enumerate(dated_parents):
+        last[parent_id] = index
+        latest[parent_id] = max(latest.get(parent_id, date), date)
+    if not last:
+        return
+    ancestors = {}
+    links = ItemClosure.objects.filter(descendant__in=list(last)).values_list(
+        'ancestor', 'descendant',
+    )
+    for ancestor_id, descendant_id in links:
+        index, date = last[str(descendant_id)], latest[str(descendant_id)]
+        if ancestor_id in ancestors:
+            index = max(index, ancestors[ancestor_id][0])
+            date = max(date, ancestors[ancestor_id][1])
+        ancestors[ancestor_id] = index, date
+    groups = defaultdict(list)
+    for ancestor_id, (index, date) in ancestors.items():
+        groups[dated_parents[index][1], date].append(ancestor_id)
+    for (date, latest_date), ancestors_ids in groups.items():
+        Item.objects.filter(pk__in=ancestors_ids).update(
+            date=date,
+            max_descendant_date=Case(
+                When(
+                    max_descendant_date__gt=latest_date,
+                    then=F('max_descendant_date'),
+                ),
+                default=Value(latest_date),
+            ),
+        )
+
+
+def apply_payloads(payloads):
+    """
+    Применяет список (дата импорта, данные из build_payload) одним
+    проходом: приращения размеров суммируются, общие предки обновляются
+    один раз, история записывается одним запросом. Поэтому каждый
+    затронутый элемент получает за проход одну запись истории
+    с итоговыми размерами и датой последнего затронувшего его импорта,
+    промежуточные состояния между импортами прохода не сохраняются.
+    Возвращает id элементов, ответы /nodes которых нужно сбросить.
+    """
+    items, dated_parents = [], []
+    deltas, abandoned, moved_parents, affected = {}, set(), set(), set()
+    for date, payload in payloads:
+        for item_id, parent_id in payload['items']:
+            items.append({'id': item_id, 'parent': parent_id})
+            if parent_id is not None:
+                dated_parents.append((parent_id, date))
+        for folder_id, *delta in payload['deltas']:
+            total = deltas.get(folder_id, (0, 0, 0))
+            deltas[folder_id] = tuple(map(sum, zip(total, delta)))
+        abandoned.update(payload['abandoned'])
+        moved_parents.update(payload['moved_parents'])
+        affected.update(payload['affected'])
+    update_ancestors_dates(dated_parents)
+    update_sizes(deltas, abandoned)
+    update_descendant_dates(moved_parents)
+    save_updated_items_in_history(items)
+    return affected
+
+
+def apply_jobs(jobs):
+    """
+    Применяет пачку заданий очереди одним проходом.
+    """
+    return apply_payloads(
+        [(job.date, json.loads(job.payload)) for job in jobs],
+    )
+
+
+def process_jobs(batch_size=None):
+    """
+    Применяет следующую пачку заданий очереди и удаляет их.
+    Пачки применяются по очереди: задания блокируются до конца
+    транзакции. Возвращает число примененных заданий.
+    """
+    batch_size = batch_size or settings.PROPAGATION_BATCH_SIZE
+    with transaction.atomic():
+        jobs = list(
+            PropagationJob.objects.select_for_update().order_by('pk')[
+                :batch_size
+            ]
+        )
+        if not jobs:
+            return 0
+        affected = apply_jobs(jobs)
+        PropagationJob.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+        # Сброс только после фиксации: при сбросе до нее параллельный
+        # запрос мог бы снова сохранить в кэше ответ по старым данным.
+        transaction.on_commit(lambda: invalidate_nodes(affected))
+    return len(jobs)
+
+
+def drain_jobs(token=None):
+    """
+    Применяет очередь до задания token включительно (или целиком).
+    """
+    while PropagationJob.objects.filter(
+        **({} if token is None else {'pk__lte': token})
+    ).exists():
+        process_jobs()
+
+
+def get_job_token(request):
+    """
+    Возвращает токен задания из заголовка запроса или None.
+    """
+    token = request.META.get(f'HTTP_{JOB_HEADER.upper().replace("-", "_")}')
+    if token is None:
+        return None
+    try:
+        token = int(token)
+    except ValueError:
+        raise ValidationError('Недопустимый токен задания')
+    if token <= 0:
+        raise ValidationError('Недопустимый токен задания')
+    return token
+
+
+def wait_for_job(token, timeout=None):
+    """
+    Ждет, пока воркер применит задание token. Если за timeout секунд
+    этого не произошло, применяет очередь до задания сам, так что после
+    возврата чтение видит результат импорта.
+    """
+    if token is None:
+        return
+    if timeout is None:
+        timeout = settings.PROPAGATION_WAIT_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while PropagationJob.objects.filter(pk=token).exists():
+        if time.monotonic() >= deadline:
+            drain_jobs(token)
+            return
+        time.sleep(POLL_INTERVAL)
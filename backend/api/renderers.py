@@ -0,0 +1,152 @@
+import json
+from datetime import datetime, timezone
+
+import orjson
+from django.conf import settings
+from items.models import FOLDER
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import DATE_TIME_FIELD
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson. Вывод побайтно совпадает с JSONRenderer
+    (компактный, без экранирования не-ASCII символов), даты выводятся
+    в формате DATE_TIME_FORMAT. Вывод с отступами и значения, которые
+    orjson не поддерживает, обрабатывает стандартный рендерер.
+    """
+    encoder = JSONEncoder()
+
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            if obj.tzinfo is not None:
+                obj = obj.astimezone(timezone.utc)
+            return obj.strftime(settings.DATE_TIME_FORMAT)
+        return self.encoder.default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.default, option=ORJSON_OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029.
+        return content.replace(LINE_SEPARATOR, b'\\u2028').replace(
+            PARAGRAPH_SEPARATOR, b'\\u2029',
+        )
+
+
+def dumps(value):
+    """
+    Сериализует скаляр так же, как JSONRenderer.
+    """
+    return json.dumps(
+        value, ensure_ascii=False, separators=(',', ':'),
+    ).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def render_json(data):
+    """
+    Рендерит данные JSON-рендерером из настроек REST_FRAMEWORK.
+    """
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+
+
+def render_aggregates(file_count, folder_count, depth, max_descendant_date):
+    """
+    Поля агрегатов элемента для ответа /nodes с параметром aggregates.
+    """
+    date = DATE_TIME_FIELD.to_representation(max_descendant_date)
+    return (
+        f',"fileCount":{file_count},"folderCount":{folder_count},'
+        f'"depth":{depth},"maxDescendantDate":{dumps(date)}'
+    )
+
+
+class TreeRenderer:
+    """
+    Пошаговый рендерер JSON поддерева по строкам из iter_subtree_rows.
+    В памяти хранится только стек открытых папок, поэтому глубина дерева
+    не ограничена глубиной рекурсии, а строки можно передавать порциями.
+    Формат совпадает с ItemSerializer, с aggregates к элементам
+    добавляются счетчики файлов и папок поддерева, глубина и последняя
+    дата поддерева.
+    """
+    def __init__(self, aggregates=False):
+        self.aggregates = aggregates
+        self.stack = []
+
+    def render_row(self, row):
+        """
+        Возвращает фрагмент JSON для очередной строки поддерева.
+        """
+        item_id, parent_id, item_type, date, url, size, depth = row[:7]
+        parts = []
+        while len(self.stack) > depth:
+            parts.append(']' + self.stack.pop()[0])
+        if self.stack:
+            if self.stack[-1][1]:
+                parts.append(',')
+            self.stack[-1][1] = True
+        head = (
+            f'{{"id":{dumps(str(item_id))},'
+            f'"parentId":{dumps(str(parent_id) if parent_id else None)},'
+            f'"children":'
+        )
+        tail = (
+            f',"type":{dumps(item_type)},'
+            f'"date":{dumps(DATE_TIME_FIELD.to_representation(date))},'
+            f'"url":{dumps(url)},"size":{dumps(size)}'
+            f'{render_aggregates(*row[7:]) if self.aggregates else ""}}}'
+        )
+        if item_type == FOLDER:
+            parts.append(head + '[')
+            self.stack.append([tail, False])
+        else:
+            parts.append(head + 'null' + tail)
+        return ''.join(parts)
+
+    def render(self, rows):
+        """
+        Рендерит порцию строк поддерева в байты.
+        """
+        return ''.join(map(self.render_row, rows)).encode()
+
+    def close(self):
+        """
+        Закрывает открытые папки и возвращает последний фрагмент JSON.
+        """
+        parts = []
+        while self.stack:
+            parts.append(']' + self.stack.pop()[0])
+        return ''.join(parts).encode()
+
+
+def render_tree_stream(rows, buffer_size=64 * 1024, aggregates=False):
+    """
+    Выдает JSON поддерева частями по строкам из iter_subtree_rows,
+    накапливая вывод в буфере размером около buffer_size.
+    """
+    renderer = TreeRenderer(aggregates)
+    buffer, buffered = [], 0
+    for row in rows:
+        part = renderer.render_row(row)
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= buffer_size:
+            yield ''.join(buffer).encode()
+            buffer, buffered = [], 0
+    yield ''.join(buffer).encode() + renderer.close()
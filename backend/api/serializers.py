@@ -1,4 +1,5 @@
-from items.models import CHOICES, FILE, FOLDER, History, Item
+from django.db import transaction
+from items.models import CHOICES, FILE, FOLDER, History, Item, ItemClosure
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import DateTimeField
 from rest_framework.relations import PrimaryKeyRelatedField
@@ -7,7 +8,12 @@ from rest_framework.serializers import (
     SerializerMethodField, UUIDField
 )
 
-from .services import get_object_or_none, update_unit
+from .services import (
+    AGGREGATE_FIELDS, get_ancestors_tree, get_size_deltas, get_stale_parents,
+    has_cycles, update_hierarchy
+)
+
+DATE_TIME_FIELD = DateTimeField()
 
 
 class ItemSerializer(ModelSerializer):
@@ -23,12 +29,12 @@ class ItemSerializer(ModelSerializer):
 
     class Meta:
         model = Item
-        exclude = ('parent',)
+        exclude = ('parent', *AGGREGATE_FIELDS)
 
     def get_children(self, obj):
-        if obj.type == FILE:
-            return None
-        return self.__class__(obj.children.all(), many=True).data
+        # Сериализатор используется только для списков файлов (/updates);
+        # поддерево для /nodes собирает TreeRenderer.
+        return None
 
 
 class ItemImportSerializer(ModelSerializer):
@@ -43,7 +49,7 @@ class ItemImportSerializer(ModelSerializer):
 
     class Meta:
         model = Item
-        exclude = ('date', 'parent')
+        exclude = ('date', 'parent', *AGGREGATE_FIELDS)
 
     def validate_url(self, url):
         if url is None:
@@ -109,23 +115,69 @@ class ItemRequestImportSerializer(Serializer):
     def create(self, validated_data):
         instance = ItemRequest(**validated_data)
         items = validated_data.get('items')
+        date = validated_data.get('updateDate')
+        tree = get_ancestors_tree(
+            {item['id'] for item in items}
+            | {item['parent'] for item in items if item.get('parent')}
+        )
+        types = {item['id']: item['type'] for item in items}
+        instance.affected_ids = {*tree, *types}
         for item in items:
-            item['date'] = validated_data['updateDate']
+            unit = tree.get(item['id'])
+            if unit and unit[1] != item['type']:
+                raise ValidationError('Элемент не может менять тип')
             parent_id = item.get('parent')
-            if parent_id:
-                try:
-                    item['parent'] = Item.objects.get(pk=parent_id)
-                    if item['parent'].type == FILE:
-                        raise ValueError('Родителем может быть только папка')
-                except (Item.DoesNotExist, ValueError):
-                    raise ValidationError('Отсутствует родитель с таким id')
-            unit = get_object_or_none(Item, pk=item.get('id'))
-            if unit:
-                if unit.type != item.get('type'):
-                    raise ValidationError('Элемент не может менять тип')
-                update_unit(unit, item)
+            if parent_id is None:
+                continue
+            parent_type = types.get(parent_id)
+            if parent_type is None and parent_id in tree:
+                parent_type = tree[parent_id][1]
+            if parent_type != FOLDER or parent_id == item['id']:
+                raise ValidationError('Отсутствует родитель с таким id')
+        if has_cycles(items, tree):
+            raise ValidationError('Папка не может быть перемещена в потомка')
+
+        moved_ids = [
+            item['id'] for item in items
+            if item['id'] in tree and tree[item['id']][0] != item.get('parent')
+        ]
+        instance.moved_parents = get_stale_parents(
+            items, tree, set(moved_ids), date,
+        )
+        new_items, updated_files, updated_folders = [], [], []
+        for item in items:
+            unit = Item(
+                id=item['id'],
+                type=item['type'],
+                date=date,
+                url=item.get('url'),
+                size=item.get('size'),
+                parent_id=item.get('parent'),
+            )
+            if item['id'] not in tree:
+                new_items.append(unit)
+            elif unit.type == FILE:
+                updated_files.append(unit)
             else:
-                Item.objects.create(**item)
+                updated_folders.append(unit)
+        instance.size_deltas, instance.abandoned_folders = get_size_deltas(
+            items, tree,
+        )
+        with transaction.atomic():
+            Item.objects.bulk_create(new_items)
+            Item.objects.bulk_update(
+                updated_files, ('url', 'date', 'size', 'parent'),
+            )
+            Item.objects.bulk_update(
+                updated_folders, ('url', 'date', 'parent'),
+            )
+            update_hierarchy([unit.id for unit in new_items], moved_ids)
+        # У всех потомков перемещенных элементов меняется глубина.
+        instance.affected_ids.update(
+            ItemClosure.objects.filter(ancestor__in=moved_ids).values_list(
+                'descendant', flat=True,
+            )
+        )
         return instance
 
 
@@ -1,8 +1,20 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
+from itertools import product
 from uuid import UUID
 
 from django.conf import settings
-from items.models import FILE, History, Item
+from django.db import connection
+from django.db.models import (
+    Case, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from items.archive import read_item_history
+from items.models import (
+    FILE, FOLDER, History, HistoryArchiveBlock, Item, ItemClosure
+)
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.status import (
@@ -21,15 +33,40 @@ RESPONSE_ITEM_NOT_FOUND = Response(
 
 RESPONSE_OK = Response(status=HTTP_200_OK)
 
+SQL_PARAMS_LIMIT = 500
 
-def get_object_or_none(model, *args, **kwargs):
+SUBTREE_CHUNK_SIZE = 2000
+
+AGGREGATE_FIELDS = (
+    'file_count', 'folder_count', 'depth', 'max_descendant_date',
+)
+
+
+def set_validators(response, etag, last_modified=None):
     """
-    Возвращает объект модели или None.
+    Добавляет в ответ заголовки ETag и Last-Modified.
     """
-    try:
-        return model.objects.get(*args, **kwargs)
-    except model.DoesNotExist:
-        return None
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def check_validators(request, etag, last_modified=None):
+    """
+    Проверяет заголовки If-None-Match и If-Modified-Since. Возвращает
+    ответ 304, если у клиента актуальная копия, иначе None.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            int(last_modified.timestamp()) if last_modified else None
+        ),
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
 
 
 def get_datetime_object(date_str):
@@ -63,76 +100,557 @@ def get_uuid(uuid, version=4):
 
 def update_folders_date(items, date):
     """
-    Функция рекурсивно обновляет дату папок, у которых
-    добавились (обновились) дочерние файлы (папки).
-    """
-    folders_ids = {item['parent'].id for item in items if item.get('parent')}
-    updated = set()
-
-    def update_date(folder):
-        if folder.parent and folder not in updated:
-            updated.add(folder)
-            folder.date = date
-            folder.save()
-            update_date(folder.parent)
-        else:
-            updated.add(folder)
-            folder.date = date
-            folder.save()
-
-    for folder_id in folders_ids:
-        folder = Item.objects.get(pk=folder_id)
-        update_date(folder)
-
-
-def update_sizes():
-    """
-    Функция рекурсивно обновляет размер папок, у которых
-    добавились или обновились файлы.
-    """
-    def update_size(item, sum_size=0):
-        if item.type == FILE:
-            return item.size
-        else:
-            children = item.children.all()
-            if children:
-                for child in children:
-                    sum_size += update_size(child)
-                item.size = sum_size
-                item.save()
-            else:
-                item.size = None
-                item.save()
-            return sum_size
+    Функция одним запросом обновляет дату и последнюю дату поддерева
+    всех папок-предков добавленных (обновленных) элементов.
+    """
+    folders_ids = {item['parent'] for item in items if item.get('parent')}
+    if not folders_ids:
+        return
+    Item.objects.filter(
+        pk__in=ItemClosure.objects.filter(
+            descendant__in=folders_ids,
+        ).values('ancestor'),
+    ).update(
+        date=date,
+        max_descendant_date=Case(
+            When(max_descendant_date__gt=date, then=F('max_descendant_date')),
+            default=Value(date),
+        ),
+    )
+
+
+def update_descendant_dates(folders_ids):
+    """
+    Пересчитывает последнюю дату поддерева папок и всех их предков
+    после удаления или перемещения потомков, а также после импорта
+    с более ранней датой, чем у сохраненных элементов (в остальных
+    случаях ее поддерживает update_folders_date). Папки обходятся снизу вверх
+    по уровням, по одному запросу на уровень: дата папки вычисляется
+    по датам ее дочерних элементов.
+    """
+    folders_ids = {folder_id for folder_id in folders_ids if folder_id}
+    if not folders_ids:
+        return
+    folders = Item.objects.filter(
+        pk__in=ItemClosure.objects.filter(
+            descendant__in=folders_ids,
+        ).values('ancestor'),
+    ).values_list('id', 'depth')
+    levels = defaultdict(list)
+    for folder_id, depth in folders:
+        levels[depth].append(folder_id)
+    latest = Subquery(
+        Item.objects.filter(parent=OuterRef('pk')).annotate(
+            latest=Greatest(
+                'date', Coalesce('max_descendant_date', 'date'),
+            ),
+        ).order_by('-latest').values('latest')[:1],
+    )
+    for depth in sorted(levels, reverse=True):
+        Item.objects.filter(pk__in=levels[depth]).update(
+            max_descendant_date=latest,
+        )
+
+
+def get_descendants(item_id, include_self=False):
+    """
+    Возвращает queryset всех потомков элемента (один запрос).
+    """
+    return Item.objects.filter(
+        ancestor_links__ancestor_id=item_id,
+        ancestor_links__depth__gte=0 if include_self else 1,
+    )
+
+
+def get_ancestors(item_id, include_self=False):
+    """
+    Возвращает queryset всех предков элемента, начиная
+    с ближайшего (один запрос).
+    """
+    return Item.objects.filter(
+        descendant_links__descendant_id=item_id,
+        descendant_links__depth__gte=0 if include_self else 1,
+    ).order_by('descendant_links__depth')
+
+
+def get_subtree_sql(vendor, aggregates=False):
+    """
+    Рекурсивный запрос поддерева элемента в порядке обхода в глубину.
+    Строки имеют вид (id, parent_id, type, date, url, size, depth),
+    с aggregates к ним добавляются значения AGGREGATE_FIELDS.
+    """
+    table = connection.ops.quote_name(Item._meta.db_table)
+    if vendor == 'postgresql':
+        root_path, child_path = 'ARRAY[id]', 't.path || i.id'
+    else:
+        root_path, child_path = 'id', "t.path || '/' || i.id"
+    extra = ''
+    if aggregates:
+        extra = ''.join(
+            f', i.{Item._meta.get_field(name).column}'
+            for name in AGGREGATE_FIELDS
+        )
+    return (
+        f'WITH RECURSIVE tree (id, path, level) AS ('
+        f'SELECT id, {root_path}, 0 FROM {table} WHERE id = %s '
+        f'UNION ALL '
+        f'SELECT i.id, {child_path}, t.level + 1 '
+        f'FROM {table} i JOIN tree t ON i.parent_id = t.id) '
+        f'SELECT i.id, i.parent_id, i.type, i.date, i.url, i.size, '
+        f't.level{extra} '
+        f'FROM tree t JOIN {table} i ON i.id = t.id ORDER BY t.path'
+    )
+
+
+def iter_subtree_rows(item_id, chunk_size=None, aggregates=False):
+    """
+    Построчно выдает поддерево элемента в порядке обхода в глубину,
+    читая его через серверный курсор. Строки имеют вид
+    (id, parent_id, type, date, url, size, depth), с aggregates к ним
+    добавляются значения AGGREGATE_FIELDS.
+    """
+    chunk_size = chunk_size or SUBTREE_CHUNK_SIZE
+    sql = get_subtree_sql(connection.vendor, aggregates)
+    names = ['id', 'parent', 'type', 'date', 'url', 'size', 'depth']
+    if aggregates:
+        names.extend(AGGREGATE_FIELDS)
+    compiler = Item.objects.none().query.get_compiler(connection=connection)
+    converters = compiler.get_converters([
+        Item._meta.get_field(name).get_col(Item._meta.db_table)
+        for name in names
+    ])
+    cursor = connection.chunked_cursor()
+    try:
+        cursor.execute(
+            sql, [Item._meta.pk.get_db_prep_value(item_id, connection)],
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from compiler.apply_converters(rows, converters)
+    finally:
+        cursor.close()
+
+
+def get_updates_queryset(date, pagination):
+    """
+    Запрос файлов, обновленных за 24 часа до date, для ответа /updates;
+    при постраничной выдаче - limit + 1 файлов после курсора.
+    """
+    queryset = Item.objects.filter(
+        date__range=get_date_range(date),
+    ).filter(type=FILE)
+    if pagination.enabled:
+        queryset = pagination.filter_queryset(queryset)[:pagination.limit + 1]
+    return queryset
+
+
+def get_history_item(item_id):
+    """
+    Запрос элемента для ответа /history с версией его истории
+    history_version - наибольшим id записи истории в базе. Запись,
+    добавленная без изменения даты элемента (например, очередью
+    пересчета), тоже меняет версию.
+    """
+    versions = History.objects.filter(item=OuterRef('pk')).values(
+        'item',
+    ).annotate(version=Max('pk')).values('version')
+    return Item.objects.filter(pk=item_id).annotate(
+        history_version=Subquery(versions),
+    )
+
+
+def get_history_etag(item):
+    """
+    Возвращает ETag истории элемента из запроса get_history_item.
+    """
+    return (
+        f'"{item.id}-{int(item.date.timestamp())}'
+        f'-{item.history_version or 0}"'
+    )
+
+
+def read_history_archive(item_id, date_start, date_end, pagination):
+    """
+    Записи архива истории элемента для ответа /history; при постраничной
+    выдаче - не более limit + 1 записей после курсора.
+    """
+    if pagination.cursor is not None:
+        date_start = max(date_start, pagination.cursor[0])
+    archived = read_item_history(
+        settings.HISTORY_ARCHIVE_DIR, item_id, date_start, date_end,
+    )
+    if pagination.enabled:
+        archived = pagination.filter_rows(archived)[:pagination.limit + 1]
+    return archived
+
+
+def get_history_queryset(item_id, date_start, date_end, pagination, archived):
+    """
+    Запрос записей истории элемента из базы для ответа /history.
+    При постраничной выдаче - limit + 1 записей после курсора, кроме
+    уже прочитанных из архива archived: дата импорта задается клиентом,
+    поэтому записи базы могут оказаться старше архивных.
+    """
+    queryset = History.objects.filter(
+        item_id=item_id, date__range=(date_start, date_end),
+    )
+    if not pagination.enabled:
+        return queryset
+    return pagination.filter_queryset(queryset).exclude(
+        pk__in=[row.id for row in archived],
+    )[:pagination.limit + 1]
+
+
+def merge_history(pagination, archived, live):
+    """
+    Объединяет записи архива и базы в историю для ответа /history
+    в порядке (date, id).
+    """
+    live_ids = {row.id for row in live}
+    history = sorted(
+        [*(row for row in archived if row.id not in live_ids), *live],
+        key=lambda row: (row.date, row.pk),
+    )
+    if pagination.enabled:
+        return pagination.get_page(history)
+    return history
+
 
-    root_items = Item.objects.filter(parent=None)
-    for root_item in root_items:
-        update_size(root_item)
+def get_ancestors_tree(ids):
+    """
+    Загружает элементы с указанными id и всех их предков одним запросом.
+    Возвращает словарь вида {id: [parent_id, type, size, file_count,
+    folder_count, date, max_descendant_date]}.
+    """
+    rows = Item.objects.filter(
+        descendant_links__descendant_id__in=ids,
+    ).distinct().values_list(
+        'id', 'parent_id', 'type', 'size', 'file_count', 'folder_count',
+        'date', 'max_descendant_date',
+    )
+    return {row[0]: list(row[1:]) for row in rows}
+
+
+def unlink_subtrees(items_ids):
+    """
+    Удаляет из таблицы замыкания связи перемещаемых поддеревьев
+    с их прежними предками. Предки и поддерево выбираются заранее:
+    удаление с двумя подзапросами к той же таблице PostgreSQL при
+    устаревшей статистике выполняет вложенными циклами за квадратичное
+    от размера таблицы время.
+    """
+    size = SQL_PARAMS_LIMIT // 2
+    for item_id in items_ids:
+        ancestors_ids = list(ItemClosure.objects.filter(
+            descendant_id=item_id, depth__gt=0,
+        ).values_list('ancestor_id', flat=True))
+        if not ancestors_ids:
+            continue
+        descendants_ids = list(ItemClosure.objects.filter(
+            ancestor_id=item_id,
+        ).values_list('descendant_id', flat=True).iterator())
+        for first, second in product(
+            range(0, len(ancestors_ids), size),
+            range(0, len(descendants_ids), size),
+        ):
+            ItemClosure.objects.filter(
+                ancestor_id__in=ancestors_ids[first:first + size],
+                descendant_id__in=descendants_ids[second:second + size],
+            ).delete()
 
 
-def save_updated_items_in_history(date):
+def link_subtrees(items_ids):
     """
-    Функция добавляет в историю элементы, у которых обновилась дата.
+    Связывает поддеревья элементов с предками их текущих родителей
+    в таблице замыкания. Элемент зависит от элемента вызова, которым
+    обрывается уже связанная цепочка предков его родителя (например,
+    от перемещаемой в том же импорте папки-предка), и связывается
+    после него: элементы связываются отдельными запросами по уровням
+    зависимостей.
     """
-    updated_items = Item.objects.filter(date=date)
-    History.objects.bulk_create(
-        [History(
-            url=item.url,
-            type=item.type,
-            date=item.date,
-            parent_id=item.parent.id if item.parent else None,
-            size=item.size,
-            item=item
-        ) for item in updated_items]
+    items_ids = set(items_ids)
+    tops = dict(
+        Item.objects.filter(
+            children__in=items_ids,
+        ).distinct().annotate(
+            top=Subquery(
+                ItemClosure.objects.filter(
+                    descendant=OuterRef('pk'),
+                ).order_by('-depth').values('ancestor')[:1],
+            ),
+        ).values_list('id', 'top')
     )
+    dependencies = {
+        item_id: tops[parent_id]
+        for item_id, parent_id in Item.objects.filter(
+            pk__in=items_ids, parent__isnull=False,
+        ).values_list('id', 'parent_id')
+    }
+    levels = {}
+    for item_id in dependencies:
+        chain = []
+        while item_id in dependencies and item_id not in levels:
+            if item_id in chain:
+                raise ValueError('Цикл в иерархии элементов')
+            chain.append(item_id)
+            item_id = dependencies[item_id]
+        level = levels.get(item_id, -1)
+        for chained_id in reversed(chain):
+            level += 1
+            levels[chained_id] = level
+    items_by_level = defaultdict(list)
+    for item_id, level in levels.items():
+        items_by_level[level].append(item_id)
+    closure = connection.ops.quote_name(ItemClosure._meta.db_table)
+    items = connection.ops.quote_name(Item._meta.db_table)
+    pk = Item._meta.pk
+    with connection.cursor() as cursor:
+        for level in sorted(items_by_level):
+            level_ids = items_by_level[level]
+            for start in range(0, len(level_ids), SQL_PARAMS_LIMIT):
+                chunk = level_ids[start:start + SQL_PARAMS_LIMIT]
+                cursor.execute(
+                    f'INSERT INTO {closure} '
+                    f'(ancestor_id, descendant_id, depth) '
+                    f'SELECT a.ancestor_id, d.descendant_id, '
+                    f'a.depth + d.depth + 1 '
+                    f'FROM {items} i '
+                    f'JOIN {closure} a ON a.descendant_id = i.parent_id '
+                    f'JOIN {closure} d ON d.ancestor_id = i.id '
+                    f'WHERE i.id IN ({", ".join(["%s"] * len(chunk))})',
+                    [pk.get_db_prep_value(item_id, connection)
+                     for item_id in chunk],
+                )
 
 
-def update_unit(unit, item):
+def update_hierarchy(new_ids, moved_ids):
     """
-    Функция обновляет данные объекта unit модели Item.
+    Обновляет таблицу замыкания для новых и перемещенных элементов
+    и глубину их поддеревьев.
     """
-    unit.url = item.get('url')
-    unit.date = item.get('date')
-    unit.size = item.get('size')
-    unit.parent = item.get('parent')
-    unit.save()
+    unlink_subtrees(moved_ids)
+    ItemClosure.objects.bulk_create(
+        ItemClosure(ancestor_id=item_id, descendant_id=item_id, depth=0)
+        for item_id in new_ids
+    )
+    items_ids = [*new_ids, *moved_ids]
+    link_subtrees(items_ids)
+    if items_ids:
+        Item.objects.filter(
+            pk__in=ItemClosure.objects.filter(
+                ancestor__in=items_ids,
+            ).values('descendant'),
+        ).update(
+            depth=Subquery(
+                ItemClosure.objects.filter(
+                    descendant=OuterRef('pk'),
+                ).order_by('-depth').values('depth')[:1],
+            ),
+        )
+
+
+def delete_subtree(item):
+    """
+    Удаляет элемент, всех его потомков и их историю (вместе с блоками
+    архива) несколькими запросами без загрузки потомков в память
+    и уменьшает размеры предков. Возвращает список id предков.
+    """
+    ancestors_ids = list(get_ancestors(item.id).values_list('id', flat=True))
+    subtree = ItemClosure.objects.filter(ancestor_id=item.id).values(
+        'descendant',
+    )
+    History.objects.filter(item__in=subtree).delete()
+    HistoryArchiveBlock.objects.filter(item__in=subtree).delete()
+    closure = connection.ops.quote_name(ItemClosure._meta.db_table)
+    items = connection.ops.quote_name(Item._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {items} WHERE id IN '
+            f'(SELECT descendant_id FROM {closure} WHERE ancestor_id = %s)',
+            [Item._meta.pk.get_db_prep_value(item.id, connection)],
+        )
+    ItemClosure.objects.filter(descendant__in=subtree).delete()
+    if item.parent_id is not None:
+        delta = tuple(-value for value in get_subtree_weight(
+            [item.parent_id, item.type, item.size, item.file_count,
+             item.folder_count],
+        ))
+        update_sizes(
+            {ancestor_id: delta for ancestor_id in ancestors_ids},
+            {item.parent_id},
+        )
+        update_descendant_dates({item.parent_id})
+    return ancestors_ids
+
+
+def get_subtree_weight(node):
+    """
+    Возвращает вклад элемента с его поддеревом в агрегаты предков:
+    (размер, число файлов, число папок).
+    """
+    _, item_type, size, file_count, folder_count = node[:5]
+    if item_type == FILE:
+        return size or 0, file_count + 1, folder_count
+    return size or 0, file_count, folder_count + 1
+
+
+def get_stale_parents(items, tree, moved, date):
+    """
+    Возвращает папки, последнюю дату поддерева которых (вместе с их
+    предками) нужно пересчитать update_descendant_dates: старых и новых
+    родителей перемещенных элементов moved. Дата импорта задается
+    клиентом, и если она старше дат элементов или последних дат поддерева
+    их предков из get_ancestors_tree, прежняя последняя дата может больше
+    не встречаться среди потомков: тогда в пересчет попадают родители
+    всех элементов импорта.
+    """
+    parents = {
+        parent_id
+        for item in items if item['id'] in moved
+        for parent_id in (tree[item['id']][0], item.get('parent'))
+    }
+    if any(
+        value is not None and value > date
+        for unit in tree.values() for value in unit[5:7]
+    ):
+        parents.update(item['parent'] for item in items if item.get('parent'))
+    return parents
+
+
+def has_cycles(items, tree):
+    """
+    Проверяет, образует ли импорт цикл в иерархии, то есть перемещается
+    ли папка в своего потомка. Новые родители элементов импорта берутся
+    из запроса, остальные - из дерева get_ancestors_tree.
+    """
+    parents = {item['id']: item.get('parent') for item in items}
+    checked = set()
+    for item_id in parents:
+        chain = set()
+        while item_id is not None and item_id not in checked:
+            if item_id in chain:
+                return True
+            chain.add(item_id)
+            if item_id in parents:
+                item_id = parents[item_id]
+            else:
+                item_id = tree.get(item_id, (None,))[0]
+        checked |= chain
+    return False
+
+
+def get_size_deltas(items, tree):
+    """
+    Вычисляет приращения размеров и счетчиков файлов и папок
+    папок-предков для импортируемых элементов по дереву
+    из get_ancestors_tree (дерево изменяется). Учитываются только
+    цепочки предков добавленных, измененных и перемещенных элементов
+    (и старого, и нового родителя). Возвращает словарь
+    {id папки: (размер, файлы, папки)} и множество папок,
+    у которых могли не остаться дочерние элементы.
+    """
+    deltas = {}
+    abandoned = set()
+
+    def propagate(folder_id, delta):
+        visited = set()
+        while folder_id is not None and folder_id not in visited:
+            visited.add(folder_id)
+            # Нулевое приращение только отмечает папки; если папка уже
+            # отмечена, отмечены и все ее предки.
+            if not any(delta) and folder_id in deltas:
+                break
+            folder = tree.setdefault(folder_id, [None, FOLDER, None, 0, 0])
+            folder[2] = (folder[2] or 0) + delta[0]
+            folder[3] += delta[1]
+            folder[4] += delta[2]
+            total = deltas.get(folder_id, (0, 0, 0))
+            deltas[folder_id] = (
+                total[0] + delta[0], total[1] + delta[1], total[2] + delta[2],
+            )
+            folder_id = folder[0]
+
+    # Сначала все элементы отсоединяются от прежних родителей, затем
+    # присоединяются к новым: иначе при обмене местами папки и ее
+    # потомка дерево на время образует цикл.
+    nodes = []
+    for item in items:
+        node = tree.get(item['id'])
+        if node is None:
+            node = tree[item['id']] = [None, item['type'], None, 0, 0]
+        elif node[0] is not None:
+            propagate(node[0], tuple(
+                -value for value in get_subtree_weight(node)
+            ))
+            abandoned.add(node[0])
+            node[0] = None
+        nodes.append(node)
+    for item, node in zip(items, nodes):
+        if item['type'] == FILE:
+            node[2] = item.get('size')
+        node[0] = item.get('parent')
+        if node[0] is not None:
+            propagate(node[0], get_subtree_weight(node))
+    return deltas, abandoned
+
+
+def update_sizes(size_deltas, abandoned_folders=()):
+    """
+    Функция применяет приращения размеров и счетчиков файлов и папок
+    из get_size_deltas к папкам-предкам одним запросом UPDATE с CASE
+    по id папки (на SQLite - частями по пределу числа параметров).
+    Папки, у которых не осталось дочерних элементов, получают размер None.
+    """
+    folders_ids = list(size_deltas)
+    # id папки передается в запрос семь раз: в условии и в трех CASE.
+    limit = connection.features.max_query_params
+    chunk_size = (limit - 1) // 7 if limit else max(len(folders_ids), 1)
+    for start in range(0, len(folders_ids), chunk_size):
+        chunk = folders_ids[start:start + chunk_size]
+        size, files, folders = (
+            Case(*(
+                When(pk=folder_id, then=Value(size_deltas[folder_id][index]))
+                for folder_id in chunk
+            ), output_field=IntegerField())
+            for index in range(3)
+        )
+        Item.objects.filter(pk__in=chunk, type=FOLDER).update(
+            size=Coalesce(F('size'), Value(0)) + size,
+            file_count=F('file_count') + files,
+            folder_count=F('folder_count') + folders,
+        )
+    if abandoned_folders:
+        Item.objects.filter(
+            pk__in=abandoned_folders,
+            type=FOLDER,
+            children__isnull=True,
+        ).update(size=None)
+
+
+def save_updated_items_in_history(items):
+    """
+    Функция одним запросом INSERT ... SELECT добавляет в историю
+    импортированные элементы и папки-предки, у которых обновилась дата.
+    Секции истории заранее создает команда history_partitions, записи
+    за другие месяцы попадают в секцию по умолчанию.
+    """
+    items_ids = {item['id'] for item in items}
+    if not items_ids:
+        return
+    folders_ids = {item['parent'] for item in items if item.get('parent')}
+    updated_items = Item.objects.filter(
+        Q(pk__in=items_ids)
+        | Q(pk__in=ItemClosure.objects.filter(
+            descendant__in=folders_ids,
+        ).values('ancestor'))
+    ).values_list('type', 'date', 'url', 'size', 'parent_id', 'id')
+    sql, params = updated_items.query.sql_with_params()
+    columns = ', '.join(
+        connection.ops.quote_name(History._meta.get_field(name).column)
+        for name in ('type', 'date', 'url', 'size', 'parent_id', 'item')
+    )
+    table = connection.ops.quote_name(History._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} ({columns}) {sql}', params)
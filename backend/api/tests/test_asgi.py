@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+from importlib import import_module, reload
+from unittest import mock, skipUnless
+
+from api.asgi import AsyncAPI
+from asgiref.wsgi import WsgiToAsgi
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from prometheus_client import REGISTRY
+
+from .unit_test import IMPORT_BATCHES
+
+ROOT_ID = IMPORT_BATCHES[0]['items'][0]['id']
+FILE_ID = '863e1a7a-1304-42ae-943b-179184c077e3'
+
+
+def call(loop, application, path, query_string='', headers=()):
+    """
+    Выполняет GET запрос к ASGI-приложению, возвращает статус,
+    заголовки и тело ответа. Цикл событий общий для всех запросов
+    теста, так как к нему привязан пул соединений asyncpg.
+    """
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    loop.run_until_complete(application({
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'server': ('testserver', 80),
+        'root_path': '',
+        'path': path,
+        'query_string': query_string.encode(),
+        'headers': [
+            (name.encode(), value.encode()) for name, value in headers
+        ],
+    }, receive, send))
+    start, body = messages[0], b''.join(
+        message.get('body', b'') for message in messages[1:]
+    )
+    return start['status'], dict(start['headers']), body
+
+
+class AsyncAPITests(TransactionTestCase):
+    """
+    Ответы ASGI-приложения совпадают с ответами WSGI-приложения.
+    """
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.loop = asyncio.new_event_loop()
+        self.application = AsyncAPI(WsgiToAsgi(get_wsgi_application()))
+        for batch in IMPORT_BATCHES:
+            self.client.post(
+                '/imports', batch, content_type='application/json',
+            )
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.application.database.close())
+        self.loop.close()
+        super().tearDown()
+
+    def get(self, path, query_string='', headers=()):
+        return call(
+            self.loop, self.application, path, query_string, headers,
+        )
+
+    def assertSameResponse(self, path, query_string=''):
+        status, _, body = self.get(path, query_string)
+        response = self.client.get(f'{path}?{query_string}')
+        self.assertEqual(status, response.status_code)
+        self.assertEqual(json.loads(body), json.loads(b''.join(response)))
+
+    def test_fallback(self):
+        """
+        Запросы без асинхронной реализации обрабатывает WSGI-приложение.
+        """
+        status, _, body = self.get('/nodes/invalid')
+        self.assertEqual(status, 400)
+        self.assertEqual(
+            json.loads(body), {'code': 400, 'message': 'Validation Failed'},
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'asyncpg requires PG')
+    def test_read_endpoints(self):
+        self.assertSameResponse(f'/nodes/{ROOT_ID}')
+        self.assertSameResponse(f'/nodes/{FILE_ID}')
+        self.assertSameResponse('/nodes/00000000-0000-4000-8000-000000000000')
+        self.assertSameResponse('/updates', 'date=2022-02-03T12:00:00Z')
+        self.assertSameResponse(
+            '/updates', 'date=2022-02-03T12:00:00Z&limit=1',
+        )
+        self.assertSameResponse(
+            f'/node/{FILE_ID}/history',
+            'dateStart=2022-02-01T00:00:00Z&dateEnd=2022-02-04T00:00:00Z',
+        )
+        self.assertSameResponse(
+            f'/node/{FILE_ID}/history',
+            'dateStart=2022-02-01T00:00:00Z&dateEnd=2022-02-04T00:00:00Z'
+            '&limit=1',
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'asyncpg requires PG')
+    def test_not_modified(self):
+        _, headers, _ = self.get(f'/nodes/{ROOT_ID}')
+        status, _, _ = self.get(
+            f'/nodes/{ROOT_ID}',
+            headers=[('if-none-match', headers[b'etag'].decode())],
+        )
+        self.assertEqual(status, 304)
+
+    @skipUnless(connection.vendor == 'postgresql', 'asyncpg requires PG')
+    @override_settings(NODES_STREAMING=True)
+    def test_streaming(self):
+        self.assertSameResponse(f'/nodes/{ROOT_ID}')
+        self.assertSameResponse(f'/nodes/{ROOT_ID}', 'aggregates=true')
+        self.assertSameResponse('/nodes/00000000-0000-4000-8000-000000000000')
+
+    @skipUnless(connection.vendor == 'postgresql', 'asyncpg requires PG')
+    @override_settings(SERVER_TIMING=True)
+    def test_metrics(self):
+        """
+        Асинхронные запросы учитываются в метриках так же, как запросы
+        через MetricsMiddleware.
+        """
+        labels = {'view': 'get_history'}
+        count = REGISTRY.get_sample_value(
+            'ya_disk_db_queries_count', labels,
+        ) or 0
+        queries = REGISTRY.get_sample_value(
+            'ya_disk_db_queries_sum', labels,
+        ) or 0
+        _, headers, _ = self.get(
+            f'/node/{FILE_ID}/history',
+            'dateStart=2022-02-01T00:00:00Z&dateEnd=2022-02-04T00:00:00Z',
+        )
+        self.assertIn(b'server-timing', headers)
+        self.assertEqual(
+            REGISTRY.get_sample_value('ya_disk_db_queries_count', labels),
+            count + 1,
+        )
+        # Элемент, блоки архива и записи истории.
+        self.assertEqual(
+            REGISTRY.get_sample_value('ya_disk_db_queries_sum', labels),
+            queries + 3,
+        )
+
+
+class EntryPointTests(SimpleTestCase):
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_workers_need_shared_cache(self):
+        """
+        Проверка того, что несколько воркеров uvicorn (WEB_CONCURRENCY)
+        не запускаются с кэшем в памяти процесса.
+        """
+        module = import_module('ya_disk.asgi')
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '2'}):
+            with self.assertRaises(ImproperlyConfigured):
+                reload(module)
+        reload(module)
@@ -0,0 +1,197 @@
+import threading
+from unittest import mock
+
+from api import group_commit
+from api.group_commit import GroupCommitter, ImportRejected, commit_group
+from api.validators import validate_import_request
+from api.views import save_import
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TransactionTestCase, override_settings
+from items.models import History, Item, ItemClosure
+from prometheus_client import REGISTRY
+from rest_framework.test import APITestCase
+
+from .test_propagation import REQUESTS
+from .unit_test import IMPORT_BATCHES, ROOT_ID
+
+FOLDER_ID = 'd515e43f-f3f6-4471-bb77-6b455017a2d2'
+FILE_ID = '863e1a7a-1304-42ae-943b-179184c077e3'
+
+
+def new_file(item_id, parent_id, size, date):
+    return validate_import_request({
+        'items': [{
+            'type': 'FILE',
+            'url': f'/file/{item_id}',
+            'id': item_id,
+            'parentId': parent_id,
+            'size': size,
+        }],
+        'updateDate': date,
+    })
+
+
+class CommitGroupTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def get_items(self):
+        return set(Item.objects.values_list(
+            'id', 'type', 'date', 'url', 'size', 'parent_id', 'file_count',
+            'folder_count', 'depth', 'max_descendant_date',
+        ))
+
+    def get_history(self):
+        return sorted(History.objects.values_list(
+            'item_id', 'date', 'url', 'size', 'parent_id',
+        ))
+
+    def test_group_matches_sequential(self):
+        """
+        Проверка того, что группа импортов, в том числе с перемещением
+        папки, дает те же элементы и последние записи истории, что
+        и импорты по одному.
+        """
+        requests = [validate_import_request(data) for data in REQUESTS]
+        for validated_data in requests:
+            save_import(validated_data)
+        expected, history = self.get_items(), self.get_history()
+        History.objects.all().delete()
+        ItemClosure.objects.all().delete()
+        Item.objects.all().delete()
+        self.assertEqual(commit_group(requests), [None] * len(requests))
+        self.assertEqual(self.get_items(), expected)
+        # История объединяется по правилу apply_payloads: одна запись
+        # на затронутый элемент за проход.
+        group_history = self.get_history()
+        self.assertLess(len(group_history), len(history))
+        self.assertEqual(
+            {row[0]: row for row in group_history},
+            {row[0]: row for row in history},
+        )
+
+    def test_rejected_request(self):
+        """
+        Проверка того, что отклоненный импорт не влияет на остальные
+        импорты группы.
+        """
+        for data in IMPORT_BATCHES[:2]:
+            save_import(validate_import_request(data))
+        invalid = validate_import_request({
+            'items': [{'type': 'FOLDER', 'id': FILE_ID, 'parentId': None}],
+            'updateDate': '2022-02-03T12:00:00Z',
+        })
+        results = commit_group([
+            new_file(
+                'a1c5e1b4-66a2-4b8c-9bd0-8f3c8e4f5a01', FOLDER_ID, 16,
+                '2022-02-03T12:00:00Z',
+            ),
+            invalid,
+            new_file(
+                'a1c5e1b4-66a2-4b8c-9bd0-8f3c8e4f5a02', ROOT_ID, 32,
+                '2022-02-03T13:00:00Z',
+            ),
+        ])
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], Exception)
+        self.assertIsNone(results[2])
+        self.assertEqual(Item.objects.get(pk=FILE_ID).type, 'FILE')
+        self.assertEqual(Item.objects.get(pk=FOLDER_ID).size, 400)
+        root = Item.objects.get(pk=ROOT_ID)
+        self.assertEqual((root.size, root.file_count), (432, 4))
+        self.assertEqual(root.date.isoformat(), '2022-02-03T13:00:00+00:00')
+
+
+@override_settings(IMPORT_GROUP_COMMIT=True)
+class GroupCommitterTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        save_import(validate_import_request(IMPORT_BATCHES[0]))
+
+    def submit_all(self, committer, requests):
+        results = [None] * len(requests)
+
+        def submit(index):
+            try:
+                results[index] = committer.submit(requests[index])
+            except ImportRejected as error:
+                results[index] = error
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=submit, args=(index,))
+            for index in range(len(requests))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_imports(self):
+        """
+        Проверка записи одновременных импортов одной транзакцией
+        с отдельным результатом для каждого запроса.
+        """
+        committer = GroupCommitter(window=5, max_size=3)
+        requests = [
+            new_file(
+                f'a1c5e1b4-66a2-4b8c-9bd0-8f3c8e4f5a0{index}', ROOT_ID,
+                index, f'2022-02-02T12:00:0{index}Z',
+            )
+            for index in range(1, 3)
+        ]
+        requests.append(validate_import_request({
+            'items': [{'type': 'FILE', 'id': ROOT_ID, 'parentId': ROOT_ID,
+                       'url': '/file', 'size': 1}],
+            'updateDate': '2022-02-02T12:00:00Z',
+        }))
+        groups = REGISTRY.get_sample_value(
+            'ya_disk_import_group_size_count',
+        ) or 0
+        results = self.submit_all(committer, requests)
+        self.assertEqual(results[:2], [None, None])
+        self.assertIsInstance(results[2], ImportRejected)
+        self.assertEqual(
+            REGISTRY.get_sample_value('ya_disk_import_group_size_count'),
+            groups + 1,
+        )
+        self.assertEqual(Item.objects.get(pk=ROOT_ID).size, 3)
+
+    def test_failed_group_pass(self):
+        """
+        Проверка того, что при ошибке общего прохода группы остальные
+        импорты записываются, а отклоняется только импорт, вызвавший
+        ошибку.
+        """
+        committer = GroupCommitter(window=5, max_size=3)
+        requests = [
+            new_file(
+                f'a1c5e1b4-66a2-4b8c-9bd0-8f3c8e4f5a0{index}', ROOT_ID,
+                index, f'2022-02-02T12:00:0{index}Z',
+            )
+            for index in range(1, 4)
+        ]
+        bad_date = requests[1]['updateDate']
+        apply_payloads = group_commit.apply_payloads
+
+        def failing_apply(payloads):
+            if any(date == bad_date for date, _ in payloads):
+                raise DatabaseError('apply failed')
+            return apply_payloads(payloads)
+
+        with mock.patch.object(
+            group_commit, 'apply_payloads', side_effect=failing_apply,
+        ):
+            results = self.submit_all(committer, requests)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], ImportRejected)
+        self.assertIsNone(results[2])
+        self.assertFalse(Item.objects.filter(
+            pk='a1c5e1b4-66a2-4b8c-9bd0-8f3c8e4f5a02',
+        ).exists())
+        self.assertEqual(Item.objects.get(pk=ROOT_ID).size, 4)
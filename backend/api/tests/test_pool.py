@@ -0,0 +1,106 @@
+import threading
+
+import psycopg2
+from django.test import SimpleTestCase
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+)
+from ya_disk.backends.postgresql_pool.pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql):
+        self.connection.pings += 1
+        if self.connection.broken:
+            raise psycopg2.OperationalError('server closed the connection')
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.pings = 0
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.connections = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def test_reuse(self):
+        pool = ConnectionPool(self.connect, size=2)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        stats = pool.get_stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_rollback_on_release(self):
+        pool = ConnectionPool(self.connect, size=1)
+        connection = pool.acquire()
+        connection.status = TRANSACTION_STATUS_INTRANS
+        pool.release(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIs(pool.acquire(), connection)
+
+    def test_health_check(self):
+        """
+        Сломанное соединение заменяется новым при выдаче.
+        """
+        pool = ConnectionPool(self.connect, size=1, check_interval=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.broken = True
+        new_connection = pool.acquire()
+        self.assertIsNot(new_connection, connection)
+        self.assertTrue(connection.closed)
+        stats = pool.get_stats()
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(stats['opened'], 1)
+
+    def test_wait_and_timeout(self):
+        pool = ConnectionPool(self.connect, size=1, timeout=0.05)
+        connection = pool.acquire()
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.acquire()
+        self.assertEqual(pool.get_stats()['timeouts'], 1)
+
+        pool.timeout = 5
+        timer = threading.Timer(0.05, pool.release, (connection,))
+        timer.start()
+        self.assertIs(pool.acquire(), connection)
+        timer.join()
+        stats = pool.get_stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_time'], 0)
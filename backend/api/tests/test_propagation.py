@@ -0,0 +1,232 @@
+import json
+from io import StringIO
+
+from api.cache import check_shared_cache, get_node_version
+from api.propagation import JOB_HEADER, process_jobs
+from django.core.cache import cache
+from django.core.checks import Tags, run_checks
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from items.models import History, Item, ItemClosure, PropagationJob
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from .unit_test import IMPORT_BATCHES, ROOT_ID
+
+FIRST_FOLDER_ID = 'd515e43f-f3f6-4471-bb77-6b455017a2d2'
+SECOND_FOLDER_ID = '1cc0129a-2bfe-474c-9ee6-d435bf5fc8f2'
+
+REQUESTS = [
+    *IMPORT_BATCHES,
+    {
+        'items': [
+            {
+                'type': 'FILE',
+                'url': '/file/url1',
+                'id': '863e1a7a-1304-42ae-943b-179184c077e3',
+                'parentId': SECOND_FOLDER_ID,
+                'size': 100,
+            },
+        ],
+        'updateDate': '2022-02-04T12:00:00Z',
+    },
+    {
+        'items': [
+            {
+                'type': 'FOLDER',
+                'id': FIRST_FOLDER_ID,
+                'parentId': SECOND_FOLDER_ID,
+            },
+        ],
+        'updateDate': '2022-02-05T12:00:00Z',
+    },
+    {
+        'items': [
+            {
+                'type': 'FILE',
+                'url': '/file/url9',
+                'id': '3fd2e2ab-d3a1-4bde-9ae4-8bfe1a4b6f8c',
+                'parentId': FIRST_FOLDER_ID,
+                'size': 32,
+            },
+        ],
+        'updateDate': '2022-02-06T12:00:00Z',
+    },
+]
+MEMCACHED = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': 'memcached:11211',
+    },
+}
+
+
+@override_settings(PROPAGATION_QUEUE=True)
+class PropagationQueueTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def import_items(self, data):
+        response = self.client.post('/imports', data=data, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        return response
+
+    def get_items(self):
+        return set(Item.objects.values_list(
+            'id', 'type', 'date', 'url', 'size', 'parent_id', 'file_count',
+            'folder_count', 'depth', 'max_descendant_date',
+        ))
+
+    def get_history(self):
+        return sorted(History.objects.values_list(
+            'item_id', 'date', 'url', 'size', 'parent_id',
+        ))
+
+    def run_requests(self, batch_size=None):
+        for data in REQUESTS:
+            self.import_items(data)
+            if batch_size:
+                call_command(
+                    'propagate', '--once', f'--batch-size={batch_size}',
+                    stdout=StringIO(),
+                )
+        call_command('propagate', '--once', stdout=StringIO())
+        state = self.get_items(), self.get_history()
+        self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': FIRST_FOLDER_ID}),
+        )
+        return (*state, self.get_items())
+
+    def reset(self):
+        History.objects.all().delete()
+        ItemClosure.objects.all().delete()
+        Item.objects.all().delete()
+
+    def test_queue_matches_sync(self):
+        """
+        Проверка того, что очередь дает тот же результат, что и пересчет
+        в запросе, а при объединении заданий совпадают элементы
+        и последние записи истории.
+        """
+        with override_settings(PROPAGATION_QUEUE=False):
+            expected = self.run_requests()
+        self.reset()
+        self.assertEqual(self.run_requests(batch_size=1), expected)
+        self.reset()
+        items, history, items_after_delete = self.run_requests()
+        self.assertEqual(items, expected[0])
+        # Объединенные задания пишут одну запись истории на элемент.
+        self.assertLess(len(history), len(expected[1]))
+        self.assertEqual(
+            {row[0]: row for row in history},
+            {row[0]: row for row in expected[1]},
+        )
+        self.assertEqual(items_after_delete, expected[2])
+        self.assertFalse(PropagationJob.objects.exists())
+
+    def test_coalesced_history(self):
+        """
+        Проверка правила объединения истории: за проход каждый
+        затронутый элемент получает одну запись с итоговыми размерами
+        и датой последнего затронувшего его импорта.
+        """
+        with override_settings(PROPAGATION_QUEUE=False):
+            for data in IMPORT_BATCHES[:3]:
+                self.import_items(data)
+        dates = {
+            FIRST_FOLDER_ID: '2022-02-04T12:00:00Z',
+            SECOND_FOLDER_ID: '2022-02-05T12:00:00Z',
+        }
+        for index, (parent_id, date) in enumerate(dates.items()):
+            self.import_items({
+                'items': [{
+                    'type': 'FILE',
+                    'url': f'/file/{index}',
+                    'id': f'a1c5e1b4-66a2-4b8c-9bd0-8f3c8e4f5a0{index}',
+                    'parentId': parent_id,
+                    'size': 8,
+                }],
+                'updateDate': date,
+            })
+        call_command('propagate', '--once', stdout=StringIO())
+        history = History.objects.filter(date__gte=dates[FIRST_FOLDER_ID])
+        items = {
+            item.id: (item.date, item.size)
+            for item in Item.objects.filter(pk__in=[
+                row.item_id for row in history
+            ])
+        }
+        self.assertEqual((len(history), len(items)), (5, 5))
+        self.assertEqual(
+            {row.item_id: (row.date, row.size) for row in history}, items,
+        )
+        root = Item.objects.get(pk=ROOT_ID)
+        self.assertEqual(root.date.isoformat(), '2022-02-05T12:00:00+00:00')
+        self.assertEqual(items[root.id], (root.date, 1936))
+
+    def test_read_your_writes(self):
+        """
+        Проверка ожидания задания по токену из ответа /imports.
+        """
+        for data in IMPORT_BATCHES:
+            response = self.import_items(data)
+        token = response[JOB_HEADER]
+        self.assertIsNone(Item.objects.get(pk=ROOT_ID).size)
+        url = reverse('api:get_item', kwargs={'uuid': ROOT_ID})
+        with override_settings(PROPAGATION_WAIT_TIMEOUT=0):
+            response = self.client.get(url, HTTP_X_PROPAGATION_JOB=token)
+        self.assertEqual(json.loads(response.content)['size'], 1984)
+        self.assertFalse(PropagationJob.objects.exists())
+        response = self.client.get(url, HTTP_X_PROPAGATION_JOB='token')
+        self.assertEqual(response.status_code, HTTP_400_BAD_REQUEST)
+
+    def test_sync_mode_without_token(self):
+        with override_settings(PROPAGATION_QUEUE=False):
+            response = self.import_items(IMPORT_BATCHES[0])
+        self.assertNotIn(JOB_HEADER, response)
+        self.assertFalse(PropagationJob.objects.exists())
+
+
+class SharedCacheTests(SimpleTestCase):
+    def test_process_local_cache(self):
+        """
+        Проверка того, что очередь пересчета и несколько воркеров
+        не запускаются с кэшем в памяти процесса.
+        """
+        self.assertEqual(run_checks(tags=[Tags.caches]), [])
+        check_shared_cache()
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_cache(workers=2)
+        with override_settings(PROPAGATION_QUEUE=True):
+            with self.assertRaises(ImproperlyConfigured):
+                check_shared_cache()
+            errors = run_checks(tags=[Tags.caches])
+            self.assertEqual([error.id for error in errors], ['api.E001'])
+
+    @override_settings(PROPAGATION_QUEUE=True, CACHES=MEMCACHED)
+    def test_shared_cache(self):
+        check_shared_cache(workers=2)
+        self.assertEqual(run_checks(tags=[Tags.caches]), [])
+
+
+@override_settings(PROPAGATION_QUEUE=True)
+class PropagationInvalidationTests(APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_invalidate_after_commit(self):
+        """
+        Проверка того, что версия поддерева сбрасывается только после
+        фиксации пересчета: до нее запрос видит старые данные.
+        """
+        self.client.post('/imports', data=IMPORT_BATCHES[0], format='json')
+        version = get_node_version(ROOT_ID)
+        with transaction.atomic():
+            self.assertTrue(process_jobs())
+            self.assertEqual(get_node_version(ROOT_ID), version)
+        self.assertNotEqual(get_node_version(ROOT_ID), version)
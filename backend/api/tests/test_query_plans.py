@@ -0,0 +1,79 @@
+from datetime import timedelta
+from uuid import uuid4
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from items.models import FILE, FOLDER, History, Item
+from items.partitions import is_history_partitioned
+
+
+class QueryPlanTests(TestCase):
+    """
+    Проверка использования индексов запросами /updates
+    и /node/{id}/history.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.date = timezone.now().replace(microsecond=0)
+        folders = [
+            Item(id=uuid4(), type=FOLDER, date=cls.date - timedelta(hours=i))
+            for i in range(20)
+        ]
+        files = [
+            Item(
+                id=uuid4(),
+                type=FILE,
+                date=cls.date - timedelta(minutes=i),
+                url=f'/file/{i}',
+                size=i + 1,
+                parent=folders[i % len(folders)],
+            ) for i in range(500)
+        ]
+        Item.objects.bulk_create([*folders, *files])
+        History.objects.bulk_create(
+            History(
+                type=item.type,
+                date=item.date - timedelta(days=day),
+                url=item.url,
+                size=item.size,
+                parent_id=item.parent_id,
+                item=item,
+            ) for item in files for day in range(5)
+        )
+        cls.item = files[0]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_updates_plan(self):
+        """
+        Выборка файлов за интервал для /updates.
+        """
+        queryset = Item.objects.filter(
+            date__range=(self.date - timedelta(days=1), self.date),
+        ).filter(type=FILE)
+        self.assertUsesIndex(queryset, 'item_type_date_idx')
+
+    def test_history_plan(self):
+        """
+        Выборка истории элемента за интервал.
+        """
+        queryset = self.item.history.all().filter(
+            date__range=(self.date - timedelta(days=2), self.date),
+        )
+        index_name = 'history_item_date_idx'
+        if is_history_partitioned():
+            # Индексы секций PostgreSQL именует сам: <секция>_item_id_date_idx.
+            index_name = '_item_id_date_idx'
+        self.assertUsesIndex(queryset, index_name)
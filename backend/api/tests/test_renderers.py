@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timezone
+from io import BytesIO
+from uuid import UUID
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, dumps
+from api.serializers import HistorySerializer
+from items.models import History
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from .unit_test import IMPORT_BATCHES, ROOT_ID
+
+
+class ORJSONRendererTests(APITestCase):
+    def assertSameOutput(self, data):
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data),
+        )
+
+    def test_api_data(self):
+        """
+        Вывод совпадает с JSONRenderer на данных API.
+        """
+        for batch in IMPORT_BATCHES:
+            self.client.post('/imports', batch, format='json')
+        self.assertSameOutput(
+            json.loads(self.client.get(f'/nodes/{ROOT_ID}').content),
+        )
+        self.assertSameOutput(
+            {'items': HistorySerializer(History.objects.all(), many=True).data}
+        )
+        self.assertSameOutput(IMPORT_BATCHES)
+
+    def test_edge_cases(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertSameOutput({
+            'text': 'Папка "1" \u2028\u2029 \\/',
+            'nested': [{1: None, 'size': 2 ** 63 - 1}, True, 1.5],
+            'id': UUID(ROOT_ID),
+        })
+        self.assertSameOutput({'size': 2 ** 70})
+        self.assertEqual(
+            dumps('/\u2028\u2029').encode(),
+            JSONRenderer().render('/\u2028\u2029'),
+        )
+        self.assertEqual(
+            ORJSONRenderer().render({'date': datetime(
+                2022, 2, 3, 15, 0, 0, 123456, tzinfo=timezone.utc,
+            )}),
+            b'{"date":"2022-02-03T15:00:00Z"}',
+        )
+
+    def test_indent(self):
+        data = {'items': [1, 2]}
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+
+class ORJSONParserTests(APITestCase):
+    def parse(self, parser, content, encoding='utf-8'):
+        return parser.parse(BytesIO(content), parser_context={
+            'encoding': encoding,
+        })
+
+    def test_same_result(self):
+        for content in (
+            '{"items":[{"id":"x","size":1}],"name":"Файл"}'.encode(),
+            b'{"size": 100000000000000000000000}',
+            b'[]',
+        ):
+            self.assertEqual(
+                self.parse(ORJSONParser(), content),
+                self.parse(JSONParser(), content),
+            )
+        content = '{"name":"Файл"}'.encode('cp1251')
+        self.assertEqual(
+            self.parse(ORJSONParser(), content, 'cp1251'), {'name': 'Файл'},
+        )
+
+    def test_invalid(self):
+        for content in (b'', b'{', b'{"size": NaN}', b'\xff'):
+            with self.assertRaises(ParseError):
+                self.parse(ORJSONParser(), content)
@@ -0,0 +1,129 @@
+import random
+from uuid import UUID
+
+from api.serializers import ItemRequestImportSerializer
+from api.validators import validate_import_request
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+ID = '069cb8d7-bbdd-47d3-ad8f-82ef4c269df1'
+PARENT_ID = 'd515e43f-f3f6-4471-bb77-6b455017a2d2'
+
+MISSING = object()
+VALUES = {
+    'id': (
+        ID, ID.upper(), ID.replace('-', ''), f'{{{ID}}}', f'urn:uuid:{ID}',
+        1, True, -1, '', 'x', None, 1.5, [], MISSING,
+    ),
+    'parentId': (PARENT_ID, ID, None, 'x', 2 ** 128, [], MISSING),
+    'type': ('FILE', 'FOLDER', 'file', '', None, 1, ['FILE'], MISSING),
+    'url': (
+        '/file', ' /file ', 'file', '', '   ', None, 1, 1.5, True,
+        '/' + 'a' * 254, '/' + 'a' * 255, ' /' + 'a' * 254 + ' ',
+        '/a\x00', '/\ud800', '/путь', MISSING,
+    ),
+    'size': (
+        1, 100, 0, -1, '12', ' 12 ', '12.0', '12.00 ', 12.0, 12.5, '1_000',
+        True, None, '', 'x', '9' * 1001, 2 ** 70, float('inf'), MISSING,
+    ),
+}
+DATES = (
+    '2022-02-01T12:00:00Z', '2022-02-01T12:00:00+03:00',
+    '2022-02-01 12:00', '2022-02-01', 'x', None, 1, MISSING,
+)
+
+
+def make_item(rng):
+    return {
+        key: value
+        for key, value in (
+            (key, rng.choice(values)) for key, values in VALUES.items()
+        )
+        if value is not MISSING
+    }
+
+
+def validate_with_serializer(data):
+    serializer = ItemRequestImportSerializer(data=data)
+    if not serializer.is_valid():
+        return None
+    data = serializer.validated_data
+    return {
+        'items': [dict(item) for item in data['items']],
+        'updateDate': data['updateDate'],
+    }
+
+
+def validate_fast(data):
+    try:
+        return validate_import_request(data)
+    except ValidationError:
+        return None
+
+
+class ImportValidatorTests(SimpleTestCase):
+    def assertSameResult(self, data):
+        self.assertEqual(
+            validate_fast(data), validate_with_serializer(data), data,
+        )
+
+    def test_same_as_serializer(self):
+        """
+        Результат совпадает с ItemRequestImportSerializer на случайных
+        запросах, включая пограничные значения полей.
+        """
+        rng = random.Random(0)
+        for _ in range(3000):
+            data = {
+                'items': [make_item(rng) for _ in range(rng.randint(0, 2))],
+                'updateDate': rng.choice(DATES),
+            }
+            if data['updateDate'] is MISSING:
+                del data['updateDate']
+            self.assertSameResult(data)
+
+    def test_valid_file(self):
+        item = {
+            'type': 'FILE', 'id': ID, 'parentId': PARENT_ID,
+            'url': ' /file ', 'size': '12.0',
+        }
+        data = validate_import_request({
+            'items': [item], 'updateDate': '2022-02-01T12:00:00Z',
+        })
+        self.assertEqual(data['items'], [{
+            'id': UUID(ID), 'parent': UUID(PARENT_ID),
+            'url': '/file', 'size': 12, 'type': 'FILE',
+        }])
+        self.assertSameResult({
+            'items': [item], 'updateDate': '2022-02-01T12:00:00Z',
+        })
+
+    def test_request_structure(self):
+        folder = {'type': 'FOLDER', 'id': ID}
+        date = '2022-02-01T12:00:00Z'
+        for data in (
+            [], None, 'x', {}, {'items': None, 'updateDate': date},
+            {'items': {}, 'updateDate': date},
+            {'items': [], 'updateDate': date},
+            {'items': [None], 'updateDate': date},
+            {'items': ['x'], 'updateDate': date},
+            {'items': [folder, folder], 'updateDate': date},
+            {'items': [folder, dict(folder, id=ID.upper())],
+             'updateDate': date},
+        ):
+            self.assertSameResult(data)
+
+    def test_aggregate_fields_ignored(self):
+        """
+        Агрегаты элемента не принимаются из запроса: лишние поля
+        игнорируются обоими валидаторами.
+        """
+        for name, value in (
+            ('file_count', 'x'), ('folder_count', -1), ('depth', 'x'),
+            ('max_descendant_date', 'x'),
+        ):
+            with self.subTest(name=name):
+                self.assertSameResult({
+                    'items': [{'type': 'FOLDER', 'id': ID, name: value}],
+                    'updateDate': '2022-02-01T12:00:00Z',
+                })
@@ -1,10 +1,36 @@
 import json
+import random
+from base64 import urlsafe_b64encode
+from datetime import datetime, timezone
+from importlib import import_module
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+from uuid import UUID, uuid4
 
+from api.cache import get_cache_stats, is_process_local
+from api.propagation import process_jobs
+from api.serializers import ItemRequestImportSerializer
+from api.services import (
+    get_ancestors, get_descendants, save_updated_items_in_history,
+    update_folders_date, update_sizes
+)
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from items.models import History, Item
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from items.models import History, HistoryArchiveBlock, Item, ItemClosure
+from items.partitions import create_history_partition, get_history_partitions
+from prometheus_client import REGISTRY
 from rest_framework.serializers import DateTimeField
 from rest_framework.status import (
-    HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
+    HTTP_200_OK, HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND
 )
 from rest_framework.test import APITestCase
 
@@ -63,6 +89,18 @@ class ItemImportTests(APITestCase):
                 self.assertEqual(response.status_code, HTTP_200_OK)
                 self.assertEqual(response.data, None)
 
+    def test_empty_import(self):
+        """
+        Импорт без элементов.
+        """
+        response = self.client.post(
+            self.url,
+            data={'items': [], 'updateDate': '2022-02-01T12:00:00Z'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertFalse(History.objects.exists())
+
     def test_invalid_id(self):
         """
         Проверка валидации id.
@@ -248,6 +286,7 @@ class ItemImportTests(APITestCase):
 class ItemGetDeleteTests(APITestCase):
     def setUp(self):
         super().setUp()
+        cache.clear()
         self.uuid = '069cb8d7-bbdd-47d3-ad8f-82ef4c269df1'
         self.children_uuid = 'd515e43f-f3f6-4471-bb77-6b455017a2d2'
         self.url_get_item = reverse('api:get_item', kwargs={'uuid': self.uuid})
@@ -274,6 +313,55 @@ class ItemGetDeleteTests(APITestCase):
         deep_sort_children(EXPECTED_TREE)
         self.assertEqual(answer, EXPECTED_TREE)
 
+    def test_get_tree_in_one_query(self):
+        """
+        Проверка того, что дерево загружается одним запросом.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url_get_item)
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        answer = json.loads(response.content)
+        deep_sort_children(answer)
+        deep_sort_children(EXPECTED_TREE)
+        self.assertEqual(answer, EXPECTED_TREE)
+
+    @override_settings(NODES_STREAMING=True)
+    def test_get_tree_streaming(self):
+        """
+        Проверка потоковой выдачи дерева.
+        """
+        response = self.client.get(self.url_get_item)
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        answer = json.loads(b''.join(response.streaming_content))
+        deep_sort_children(answer)
+        deep_sort_children(EXPECTED_TREE)
+        self.assertEqual(answer, EXPECTED_TREE)
+        url = reverse('api:get_item', kwargs={'uuid': self.children_uuid})
+        response = self.client.get(url)
+        answer = json.loads(b''.join(response.streaming_content))
+        with override_settings(NODES_STREAMING=False):
+            expected = json.loads(self.client.get(url).content)
+        self.assertEqual(answer, expected)
+
+    @override_settings(NODES_STREAMING=True)
+    def test_get_not_found_streaming(self):
+        """
+        Проверка ответа для несуществующего элемента в потоковом режиме.
+        """
+        url = reverse('api:get_item', kwargs={'uuid': str(uuid4())})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTP_404_NOT_FOUND)
+
+    def test_get_not_found(self):
+        """
+        Проверка ответа для несуществующего элемента.
+        """
+        url = reverse('api:get_item', kwargs={'uuid': str(uuid4())})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, RESPONSE_ITEM_NOT_FOUND)
+
     def test_delete_item(self):
         """
         Проверка удаления элемента из БД. Также удаляется все дети и истории.
@@ -284,6 +372,44 @@ class ItemGetDeleteTests(APITestCase):
         self.assertEqual(Item.objects.all().count(), 0)
         self.assertEqual(History.objects.all().count(), 0)
 
+    def test_delete_updates_sizes(self):
+        """
+        Проверка уменьшения размеров предков при удалении.
+        """
+        first_folder_id = 'd515e43f-f3f6-4471-bb77-6b455017a2d2'
+        second_folder_id = '1cc0129a-2bfe-474c-9ee6-d435bf5fc8f2'
+        response = self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': first_folder_id}),
+        )
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(Item.objects.get(pk=self.uuid).size, 1600)
+        self.assertEqual(Item.objects.count(), 5)
+        self.assertEqual(
+            History.objects.filter(item_id=self.uuid).count(), 4,
+        )
+        self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': second_folder_id}),
+        )
+        self.assertIsNone(Item.objects.get(pk=self.uuid).size)
+        self.assertEqual(ItemClosure.objects.count(), 1)
+
+    def test_delete_query_count(self):
+        """
+        Проверка того, что число запросов при удалении не зависит
+        от размера поддерева.
+        """
+        queries = []
+        for uuid in (
+            'd515e43f-f3f6-4471-bb77-6b455017a2d2',
+            '1cc0129a-2bfe-474c-9ee6-d435bf5fc8f2',
+        ):
+            with CaptureQueriesContext(connection) as context:
+                self.client.delete(
+                    reverse('api:delete_item', kwargs={'uuid': uuid}),
+                )
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
     def test_get_invalid_uuid(self):
         """
         Проверка валидации uuid при GET запросе.
@@ -305,7 +431,36 @@ class ItemGetDeleteTests(APITestCase):
         self.assertEqual(response.data, RESPONSE_VALIDATION_ERROR)
 
 
-class ItemUpdatesTests(APITestCase):
+class PaginationMixin:
+    def get_pages(self, url, limit):
+        items, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get(f'{url}&limit={limit}&cursor={cursor}')
+            self.assertEqual(response.status_code, HTTP_200_OK)
+            page = json.loads(response.content)
+            self.assertLessEqual(len(page['items']), limit)
+            items.extend(page['items'])
+            cursor = page['next']
+        return items
+
+
+class ImportedTreeMixin:
+    """
+    Загружает дерево из IMPORT_BATCHES перед каждым тестом.
+    """
+    root_id = '069cb8d7-bbdd-47d3-ad8f-82ef4c269df1'
+    first_folder_id = 'd515e43f-f3f6-4471-bb77-6b455017a2d2'
+    second_folder_id = '1cc0129a-2bfe-474c-9ee6-d435bf5fc8f2'
+    file_id = '863e1a7a-1304-42ae-943b-179184c077e3'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for batch in IMPORT_BATCHES:
+            self.client.post('/imports', data=batch, format='json')
+
+
+class ItemUpdatesTests(PaginationMixin, APITestCase):
     def setUp(self):
         super().setUp()
         for batch in IMPORT_BATCHES:
@@ -326,6 +481,35 @@ class ItemUpdatesTests(APITestCase):
         self.assertEqual(response.status_code, HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, RESPONSE_VALIDATION_ERROR)
 
+    def test_updates_pagination(self):
+        """
+        Проверка постраничной выдачи /updates.
+        """
+        url = '/updates?date=2022-02-03T15:00:00Z'
+        expected = json.loads(self.client.get(url).content)['items']
+        self.assertNotIn('next', json.loads(self.client.get(url).content))
+        items = self.get_pages(url, 2)
+        self.assertEqual(len(items), 3)
+        self.assertEqual(
+            sorted(items, key=lambda item: item['id']),
+            sorted(expected, key=lambda item: item['id']),
+        )
+        self.assertEqual(
+            [item['date'] for item in items],
+            sorted(item['date'] for item in items),
+        )
+
+    def test_invalid_pagination(self):
+        """
+        Проверка валидации limit и cursor.
+        """
+        url = '/updates?date=2022-02-03T15:00:00Z'
+        for params in ('limit=0', 'limit=abc', 'limit=2&cursor=abc'):
+            with self.subTest(params=params):
+                response = self.client.get(f'{url}&{params}')
+                self.assertEqual(response.status_code, HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data, RESPONSE_VALIDATION_ERROR)
+
     def test_updated_parent_folder_date(self):
         """
         Проверка на обновление дат всех родителей элемента.
@@ -347,8 +531,68 @@ class ItemUpdatesTests(APITestCase):
             date_folder_after_update,
         )
 
+    def test_update_folders_date_query_count(self):
+        """
+        Проверка обновления дат всех предков одним запросом.
+        """
+        date = DateTimeField().to_internal_value('2022-02-05T12:00:00Z')
+        items = [
+            {'parent': UUID('1cc0129a-2bfe-474c-9ee6-d435bf5fc8f2')},
+            {'parent': UUID('d515e43f-f3f6-4471-bb77-6b455017a2d2')},
+        ]
+        with self.assertNumQueries(1):
+            update_folders_date(items, date)
+        self.assertEqual(Item.objects.filter(date=date).count(), 3)
+
+    def test_save_history_query_count(self):
+        """
+        Проверка сохранения истории одним запросом только для
+        измененных элементов и их предков.
+        """
+        items = [
+            {
+                'id': UUID('73bc3b36-02d1-4245-ab35-3106c9ee1c65'),
+                'parent': UUID('1cc0129a-2bfe-474c-9ee6-d435bf5fc8f2'),
+            },
+        ]
+        count = History.objects.count()
+        with self.assertNumQueries(1):
+            save_updated_items_in_history(items)
+        self.assertEqual(History.objects.count(), count + 3)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'partitions require PG')
+class HistoryPartitionTests(APITestCase):
+    def count_rows(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {table}')
+            return cursor.fetchone()[0]
 
-class HistoryTests(APITestCase):
+    def test_out_of_range_date(self):
+        """
+        Проверка того, что импорт не создает секций: запись за месяц
+        без секции попадает в секцию по умолчанию и переносится
+        в секцию месяца при ее создании.
+        """
+        call_command('history_partitions', stdout=StringIO())
+        partitions = get_history_partitions()
+        data = {
+            'items': [
+                {'type': 'FOLDER', 'id': str(uuid4()), 'parentId': None},
+            ],
+            'updateDate': '1900-01-01T12:00:00Z',
+        }
+        response = self.client.post('/imports', data=data, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(get_history_partitions(), partitions)
+        self.assertEqual(self.count_rows('items_history_default'), 1)
+        create_history_partition(datetime(1900, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(self.count_rows('items_history_default'), 0)
+        self.assertEqual(self.count_rows('items_history_1900_01'), 1)
+        self.assertEqual(History.objects.count(), 1)
+
+
+class HistoryTests(PaginationMixin, APITestCase):
     def setUp(self):
         super().setUp()
         self.uuid = '069cb8d7-bbdd-47d3-ad8f-82ef4c269df1'
@@ -435,3 +679,961 @@ class HistoryTests(APITestCase):
         response = self.client.get(self.url)
         answer = json.loads(response.content)
         self.assertEqual(answer, excepted_response)
+
+    def test_history_from_archive(self):
+        """
+        Проверка вывода истории, перенесенной в архив.
+        """
+        expected = json.loads(self.client.get(self.url).content)
+        with TemporaryDirectory() as directory, \
+                override_settings(HISTORY_ARCHIVE_DIR=directory):
+            call_command(
+                'archive_history',
+                days=1,
+                chunk_size=3,
+                directory=directory,
+                stdout=StringIO(),
+            )
+            self.assertEqual(History.objects.count(), 0)
+            answer = json.loads(self.client.get(self.url).content)
+            self.assertEqual(answer, expected)
+            url = (
+                f'/node/{self.uuid}/history?dateStart=2022-02-02T12:00:00Z&'
+                f'dateEnd=2022-02-03T12:00:00Z'
+            )
+            answer = json.loads(self.client.get(url).content)
+            self.assertEqual(
+                [row['size'] for row in answer['items']], [384, 1920],
+            )
+
+    def test_archive_purged_on_delete(self):
+        """
+        Проверка того, что архивная история удаленного элемента
+        не возвращается после повторного импорта с тем же id.
+        """
+        with TemporaryDirectory() as directory, \
+                override_settings(HISTORY_ARCHIVE_DIR=directory):
+            call_command(
+                'archive_history', days=1, directory=directory,
+                stdout=StringIO(),
+            )
+            self.assertTrue(HistoryArchiveBlock.objects.exists())
+            self.client.delete(
+                reverse('api:delete_item', kwargs={'uuid': self.uuid}),
+            )
+            self.assertFalse(HistoryArchiveBlock.objects.exists())
+            self.client.post('/imports', data=IMPORT_BATCHES[0], format='json')
+            answer = json.loads(self.client.get(self.url).content)
+            self.assertEqual(
+                [row['date'] for row in answer['items']],
+                [IMPORT_BATCHES[0]['updateDate']],
+            )
+
+    def test_history_pagination(self):
+        """
+        Проверка постраничной выдачи истории, в том числе архивной.
+        """
+        expected = json.loads(self.client.get(self.url).content)['items']
+        items = self.get_pages(self.url, 1)
+        self.assertEqual(items, expected)
+        with TemporaryDirectory() as directory, \
+                override_settings(HISTORY_ARCHIVE_DIR=directory):
+            call_command(
+                'archive_history',
+                days=1,
+                directory=directory,
+                stdout=StringIO(),
+            )
+            items = self.get_pages(self.url, 3)
+        self.assertEqual(items, expected)
+
+    def test_naive_cursor(self):
+        """
+        Проверка ответа 400 на курсор с датой без часового пояса.
+        """
+        cursor = urlsafe_b64encode(b'2022-02-01T11:00:00|1').decode()
+        with TemporaryDirectory() as directory, \
+                override_settings(HISTORY_ARCHIVE_DIR=directory):
+            call_command(
+                'archive_history', days=1, directory=directory,
+                stdout=StringIO(),
+            )
+            response = self.client.get(f'{self.url}&limit=1&cursor={cursor}')
+        self.assertEqual(response.status_code, HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, RESPONSE_VALIDATION_ERROR)
+
+    def test_history_order_with_archive(self):
+        """
+        Проверка порядка истории, когда запись базы старше архивных
+        (дата импорта задается клиентом).
+        """
+        uuid = str(uuid4())
+        url = (
+            f'/node/{uuid}/history?dateStart={self.date_start}&'
+            f'dateEnd={self.date_end}'
+        )
+        dates = (
+            '2022-02-01T12:00:00Z', '2022-02-03T12:00:00Z',
+            '2022-02-02T12:00:00Z',
+        )
+        with TemporaryDirectory() as directory, \
+                override_settings(HISTORY_ARCHIVE_DIR=directory):
+            for index, date in enumerate(dates):
+                if index == 2:
+                    call_command(
+                        'archive_history', days=1, directory=directory,
+                        stdout=StringIO(),
+                    )
+                data = {
+                    'items': [
+                        {'type': 'FOLDER', 'id': uuid, 'parentId': None},
+                    ],
+                    'updateDate': date,
+                }
+                self.client.post('/imports', data=data, format='json')
+            items = json.loads(self.client.get(url).content)['items']
+            self.assertEqual([row['date'] for row in items], sorted(dates))
+            self.assertEqual(self.get_pages(url, 1), items)
+
+    def test_history_etag(self):
+        """
+        Проверка ответа 304 для истории без изменений элемента.
+        """
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTP_304_NOT_MODIFIED)
+        data = {
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.uuid,
+                    'parentId': None,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }
+        self.client.post('/imports', data=data, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTP_200_OK)
+
+    @override_settings(PROPAGATION_QUEUE=True)
+    def test_history_etag_queued(self):
+        """
+        Проверка того, что запись истории, добавленная очередью пересчета
+        без изменения даты элемента, меняет ETag истории.
+        """
+        date = '2022-02-03T14:00:00Z'
+        data = {
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.uuid,
+                    'parentId': None,
+                },
+            ],
+            'updateDate': date,
+        }
+        self.client.post('/imports', data=data, format='json')
+        etag = self.client.get(self.url)['ETag']
+        process_jobs()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        history = json.loads(response.content)['items']
+        self.assertIn(date, [row['date'] for row in history])
+
+
+class ItemSizesTests(ImportedTreeMixin, APITestCase):
+    def get_size(self, uuid):
+        return Item.objects.get(pk=uuid).size
+
+    def test_move_file(self):
+        """
+        Проверка пересчета размеров старого и нового родителя
+        при перемещении файла.
+        """
+        data = {
+            'items': [
+                {
+                    'type': 'FILE',
+                    'url': '/file/url1',
+                    'id': '863e1a7a-1304-42ae-943b-179184c077e3',
+                    'parentId': self.second_folder_id,
+                    'size': 100,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }
+        response = self.client.post('/imports', data=data, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(self.get_size(self.first_folder_id), 256)
+        self.assertEqual(self.get_size(self.second_folder_id), 1700)
+        self.assertEqual(self.get_size(self.root_id), 1956)
+
+    def test_move_folder_and_reimport(self):
+        """
+        Проверка перемещения папки и повторного импорта папки
+        без изменения размера.
+        """
+        data = {
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.first_folder_id,
+                    'parentId': self.second_folder_id,
+                },
+                {
+                    'type': 'FOLDER',
+                    'id': self.root_id,
+                    'parentId': None,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }
+        response = self.client.post('/imports', data=data, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(self.get_size(self.first_folder_id), 384)
+        self.assertEqual(self.get_size(self.second_folder_id), 1984)
+        self.assertEqual(self.get_size(self.root_id), 1984)
+
+    def test_empty_folder_after_move(self):
+        """
+        Проверка того, что у папки без дочерних элементов нет размера.
+        """
+        data = {
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.first_folder_id,
+                    'parentId': None,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }
+        response = self.client.post('/imports', data=data, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(self.get_size(self.root_id), 1600)
+        data['items'][0]['parentId'] = self.root_id
+        data['items'].append({
+            'type': 'FOLDER',
+            'id': self.second_folder_id,
+            'parentId': self.first_folder_id,
+        })
+        self.client.post('/imports', data=data, format='json')
+        data = {
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.first_folder_id,
+                    'parentId': None,
+                },
+            ],
+            'updateDate': '2022-02-05T12:00:00Z',
+        }
+        self.client.post('/imports', data=data, format='json')
+        self.assertIsNone(self.get_size(self.root_id))
+        self.assertEqual(self.get_size(self.first_folder_id), 1984)
+
+    def test_move_folder_into_descendant(self):
+        """
+        Проверка того, что папку нельзя переместить в ее потомка,
+        в том числе через перемещение другой папки в том же импорте.
+        """
+        for items in (
+            [{
+                'type': 'FOLDER',
+                'id': self.root_id,
+                'parentId': self.first_folder_id,
+            }],
+            [
+                {
+                    'type': 'FOLDER',
+                    'id': self.first_folder_id,
+                    'parentId': self.second_folder_id,
+                },
+                {
+                    'type': 'FOLDER',
+                    'id': self.second_folder_id,
+                    'parentId': self.first_folder_id,
+                },
+            ],
+        ):
+            response = self.client.post('/imports', data={
+                'items': items,
+                'updateDate': '2022-02-04T12:00:00Z',
+            }, format='json')
+            self.assertEqual(response.status_code, HTTP_400_BAD_REQUEST)
+        self.assertIsNone(Item.objects.get(pk=self.root_id).parent_id)
+        self.assertEqual(self.get_size(self.root_id), 1984)
+
+    def test_swap_folder_with_child(self):
+        """
+        Проверка размеров после того, как папка и ее дочерняя папка
+        в одном импорте меняются местами.
+        """
+        second_folder_size = self.get_size(self.second_folder_id)
+        response = self.client.post('/imports', data={
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.root_id,
+                    'parentId': self.second_folder_id,
+                },
+                {
+                    'type': 'FOLDER',
+                    'id': self.second_folder_id,
+                    'parentId': None,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        second_folder = Item.objects.get(pk=self.second_folder_id)
+        root = Item.objects.get(pk=self.root_id)
+        self.assertEqual(second_folder.size, 1984)
+        self.assertEqual(root.size, 1984 - second_folder_size)
+        self.assertEqual(
+            (second_folder.file_count, second_folder.folder_count),
+            (root.file_count + 3, root.folder_count + 1),
+        )
+
+    def test_import_query_count(self):
+        """
+        Проверка того, что число запросов при записи пакета не зависит
+        от количества элементов в нем.
+        """
+        queries = []
+        # Пакеты меньше одной пачки bulk_create в SQLite (999 параметров).
+        for count in (10, 80):
+            serializer = ItemRequestImportSerializer(data={
+                'items': [
+                    {
+                        'type': 'FILE',
+                        'url': f'/file/{index}',
+                        'id': str(uuid4()),
+                        'parentId': self.first_folder_id,
+                        'size': 1,
+                    } for index in range(count)
+                ],
+                'updateDate': '2022-02-04T12:00:00Z',
+            })
+            self.assertTrue(serializer.is_valid())
+            with CaptureQueriesContext(connection) as context:
+                serializer.save()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(
+            Item.objects.filter(url__startswith='/file/').count(), 95,
+        )
+
+
+class HierarchyTests(ImportedTreeMixin, APITestCase):
+    def get_ancestors_ids(self, uuid):
+        return [str(item.id) for item in get_ancestors(uuid)]
+
+    def test_descendants_and_ancestors(self):
+        """
+        Проверка выборки всех потомков и всех предков элемента.
+        """
+        self.assertEqual(get_descendants(self.root_id).count(), 7)
+        self.assertEqual(
+            get_descendants(self.root_id, include_self=True).count(), 8,
+        )
+        self.assertEqual(
+            self.get_ancestors_ids(self.file_id),
+            [self.first_folder_id, self.root_id],
+        )
+
+    def test_move_subtree(self):
+        """
+        Проверка обновления иерархии при перемещении папки.
+        """
+        data = {
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.first_folder_id,
+                    'parentId': self.second_folder_id,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }
+        self.client.post('/imports', data=data, format='json')
+        self.assertEqual(get_descendants(self.second_folder_id).count(), 6)
+        self.assertEqual(
+            self.get_ancestors_ids(self.file_id),
+            [self.first_folder_id, self.second_folder_id, self.root_id],
+        )
+        self.assertEqual(
+            ItemClosure.objects.count(),
+            sum(len(self.get_ancestors_ids(item.id)) + 1
+                for item in Item.objects.all()),
+        )
+
+    def assertHierarchyMatchesParents(self):
+        """
+        Сверяет таблицу замыкания и глубину элементов с обходом
+        по ссылкам на родителей.
+        """
+        parents = dict(Item.objects.values_list('id', 'parent_id'))
+        links, depths = set(), {}
+        for item_id in parents:
+            ancestor_id, depth = item_id, 0
+            while ancestor_id is not None:
+                links.add((ancestor_id, item_id, depth))
+                ancestor_id, depth = parents[ancestor_id], depth + 1
+            depths[item_id] = depth - 1
+        self.assertEqual(
+            set(ItemClosure.objects.values_list(
+                'ancestor_id', 'descendant_id', 'depth',
+            )),
+            links,
+        )
+        self.assertEqual(
+            dict(Item.objects.values_list('id', 'depth')), depths,
+        )
+
+    def test_move_and_add_into_moved_subtree(self):
+        """
+        Проверка связывания элементов, которые в одном импорте попадают
+        в поддерево перемещаемой папки.
+        """
+        subfolder_id = str(uuid4())
+        self.client.post('/imports', data={
+            'items': [{
+                'type': 'FOLDER',
+                'id': subfolder_id,
+                'parentId': self.first_folder_id,
+            }],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }, format='json')
+        response = self.client.post('/imports', data={
+            'items': [
+                {
+                    'type': 'FILE',
+                    'url': '/file/new',
+                    'id': str(uuid4()),
+                    'parentId': subfolder_id,
+                    'size': 10,
+                },
+                {
+                    'type': 'FILE',
+                    'url': '/file/url3',
+                    'id': '98883e8f-0507-482f-bce2-2fb306cf6483',
+                    'parentId': subfolder_id,
+                    'size': 512,
+                },
+                {
+                    'type': 'FOLDER',
+                    'id': self.first_folder_id,
+                    'parentId': self.second_folder_id,
+                },
+            ],
+            'updateDate': '2022-02-05T12:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertHierarchyMatchesParents()
+        self.assertEqual(Item.objects.get(pk=self.second_folder_id).size, 1994)
+        response = self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': self.second_folder_id}),
+        )
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(Item.objects.count(), 1)
+        self.assertHierarchyMatchesParents()
+
+    def test_random_moves(self):
+        """
+        Проверка иерархии после случайных перемещений нескольких папок
+        и добавления файлов в одном импорте.
+        """
+        generator = random.Random(0)
+        parents = dict(Item.objects.values_list('id', 'parent_id'))
+        folders = list(Item.objects.filter(type='FOLDER').order_by(
+            'id',
+        ).values_list('id', flat=True))
+
+        def new_uuid():
+            return UUID(int=generator.getrandbits(128), version=4)
+
+        for day in range(1, 21):
+            new_id = new_uuid()
+            parents[new_id] = generator.choice(folders)
+            items = [{
+                'type': 'FOLDER',
+                'id': str(new_id),
+                'parentId': str(parents[new_id]),
+            }]
+            moved = set()
+            for folder_id in generator.sample(folders, 3):
+                parent_id = generator.choice([None, *folders])
+                ancestor_id = parent_id
+                while ancestor_id not in (None, folder_id):
+                    ancestor_id = parents[ancestor_id]
+                if ancestor_id is None:
+                    parents[folder_id] = parent_id
+                    moved.add(folder_id)
+            folders.append(new_id)
+            for folder_id in sorted(moved):
+                parent_id = parents[folder_id]
+                items.append({
+                    'type': 'FOLDER',
+                    'id': str(folder_id),
+                    'parentId': str(parent_id) if parent_id else None,
+                })
+            items.append({
+                'type': 'FILE',
+                'url': f'/file/{day}',
+                'id': str(new_uuid()),
+                'parentId': str(generator.choice(folders)),
+                'size': day,
+            })
+            generator.shuffle(items)
+            response = self.client.post('/imports', data={
+                'items': items,
+                'updateDate': f'2022-03-{day:02}T12:00:00Z',
+            }, format='json')
+            self.assertEqual(response.status_code, HTTP_200_OK)
+            self.assertHierarchyMatchesParents()
+
+
+class DeepTreeTests(APITestCase):
+    # Глубже предела вложенности orjson и рекурсивной сериализации.
+    depth = 300
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.folder_ids = [str(uuid4()) for _ in range(self.depth)]
+        self.file_id = str(uuid4())
+        items = [
+            {'type': 'FOLDER', 'id': folder_id, 'parentId': parent_id}
+            for folder_id, parent_id in zip(
+                self.folder_ids, [None] + self.folder_ids[:-1],
+            )
+        ]
+        items.append({
+            'type': 'FILE',
+            'url': '/file/deep',
+            'id': self.file_id,
+            'parentId': self.folder_ids[-1],
+            'size': 64,
+        })
+        response = self.client.post('/imports', data={
+            'items': items, 'updateDate': '2022-02-01T12:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.root_id = self.folder_ids[0]
+
+    def get_node(self, uuid):
+        return self.client.get(reverse('api:get_item', kwargs={'uuid': uuid}))
+
+    def test_get_deep_tree(self):
+        """
+        Проверка выдачи цепочки папок глубже предела рекурсии.
+        """
+        content = self.get_node(self.root_id).content
+        self.assertEqual(content.count(b'"children":['), self.depth)
+        self.assertTrue(content.startswith(
+            f'{{"id":"{self.root_id}","parentId":null,'.encode(),
+        ))
+        self.assertTrue(content.endswith(b'"size":64}'))
+        with override_settings(NODES_STREAMING=True):
+            response = self.get_node(self.root_id)
+            self.assertEqual(b''.join(response.streaming_content), content)
+
+    def test_update_sizes_statements(self):
+        """
+        Проверка того, что приращения размеров всей цепочки папок
+        применяются одним запросом (на SQLite - частями по пределу
+        числа параметров).
+        """
+        deltas = {
+            folder_id: (index + 1, 1, index % 2)
+            for index, folder_id in enumerate(self.folder_ids)
+        }
+        limit = connection.features.max_query_params
+        statements = 1 if limit is None else -(
+            -len(deltas) // ((limit - 1) // 7)
+        )
+        with self.assertNumQueries(statements):
+            update_sizes(deltas)
+        folders = [
+            Item.objects.get(pk=folder_id) for folder_id in self.folder_ids[:3]
+        ]
+        self.assertEqual(
+            [(folder.size, folder.file_count) for folder in folders],
+            [(65, 2), (66, 2), (67, 2)],
+        )
+
+    def test_move_and_delete_deep_tree(self):
+        """
+        Проверка пересчета размеров и удаления глубокой цепочки папок.
+        """
+        self.assertEqual(Item.objects.get(pk=self.root_id).size, 64)
+        response = self.client.post('/imports', data={
+            'items': [{
+                'type': 'FOLDER',
+                'id': self.folder_ids[1],
+                'parentId': None,
+            }],
+            'updateDate': '2022-02-02T12:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertIsNone(Item.objects.get(pk=self.root_id).size)
+        self.assertEqual(Item.objects.get(pk=self.folder_ids[1]).size, 64)
+        response = self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': self.folder_ids[1]}),
+        )
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertEqual(Item.objects.count(), 1)
+
+
+class NodesCacheTests(ImportedTreeMixin, APITestCase):
+    def get_node(self, uuid):
+        return self.client.get(reverse('api:get_item', kwargs={'uuid': uuid}))
+
+    def test_process_local_cache(self):
+        """
+        Проверка распознавания кэша, не общего для воркеров.
+        """
+        self.assertTrue(is_process_local())
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': 'memcached:11211',
+        }}):
+            self.assertFalse(is_process_local())
+
+    def test_cache_hit(self):
+        """
+        Проверка повторного ответа из кэша без запросов к БД.
+        """
+        first = self.get_node(self.root_id)
+        with self.assertNumQueries(0):
+            second = self.get_node(self.root_id)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(get_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_invalidate_ancestors_only(self):
+        """
+        Проверка сброса кэша измененного поддерева и его предков
+        с сохранением кэша соседних поддеревьев.
+        """
+        self.get_node(self.root_id)
+        self.get_node(self.first_folder_id)
+        data = {
+            'items': [
+                {
+                    'type': 'FILE',
+                    'url': '/file/url6',
+                    'id': str(uuid4()),
+                    'parentId': self.second_folder_id,
+                    'size': 16,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }
+        self.client.post('/imports', data=data, format='json')
+        with self.assertNumQueries(0):
+            self.get_node(self.first_folder_id)
+        response = self.get_node(self.root_id)
+        self.assertEqual(json.loads(response.content)['size'], 2000)
+        self.assertEqual(get_cache_stats(), {'hits': 1, 'misses': 3})
+
+    def test_invalidate_deleted_subtree(self):
+        """
+        Проверка того, что удаленные элементы не отдаются из кэша.
+        """
+        self.get_node(self.first_folder_id)
+        self.get_node(self.root_id)
+        self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': self.root_id}),
+        )
+        response = self.get_node(self.first_folder_id)
+        self.assertEqual(response.status_code, HTTP_404_NOT_FOUND)
+        response = self.get_node(self.root_id)
+        self.assertEqual(response.status_code, HTTP_404_NOT_FOUND)
+
+    def test_etag(self):
+        """
+        Проверка ответа 304 по заголовку If-None-Match.
+        """
+        response = self.get_node(self.root_id)
+        etag = response['ETag']
+        self.assertEqual(response['Last-Modified'], http_date(
+            parse_datetime('2022-02-03T15:00:00Z').timestamp(),
+        ))
+        url = reverse('api:get_item', kwargs={'uuid': self.root_id})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': self.first_folder_id}),
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified(self):
+        """
+        Проверка ответа 304 по заголовку If-Modified-Since.
+        """
+        url = reverse('api:get_item', kwargs={'uuid': self.root_id})
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Thu, 03 Feb 2022 15:00:00 GMT',
+        )
+        self.assertEqual(response.status_code, HTTP_304_NOT_MODIFIED)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Thu, 03 Feb 2022 14:00:00 GMT',
+        )
+        self.assertEqual(response.status_code, HTTP_200_OK)
+
+
+class AggregatesTests(ImportedTreeMixin, APITestCase):
+    def get_node(self, uuid, **params):
+        return self.client.get(
+            reverse('api:get_item', kwargs={'uuid': uuid}), params,
+        )
+
+    def assertAggregatesConsistent(self):
+        """
+        Сравнивает сохраненные агрегаты с пересчитанными по дереву.
+        """
+        for item in Item.objects.all():
+            descendants = list(get_descendants(item.id))
+            self.assertEqual(
+                (
+                    item.file_count, item.folder_count, item.depth,
+                    item.max_descendant_date,
+                ),
+                (
+                    sum(child.type == 'FILE' for child in descendants),
+                    sum(child.type == 'FOLDER' for child in descendants),
+                    get_ancestors(item.id).count(),
+                    max((child.date for child in descendants), default=None),
+                ),
+                item.id,
+            )
+
+    def test_get_aggregates(self):
+        """
+        Проверка выдачи агрегатов в /nodes только по параметру aggregates.
+        """
+        self.assertAggregatesConsistent()
+        response = self.get_node(self.root_id)
+        self.assertNotIn('fileCount', json.loads(response.content))
+        response = self.get_node(self.root_id, aggregates='true')
+        data = json.loads(response.content)
+        self.assertEqual(
+            (data['fileCount'], data['folderCount'], data['depth']),
+            (5, 2, 0),
+        )
+        self.assertEqual(data['maxDescendantDate'], '2022-02-03T15:00:00Z')
+        child = next(
+            child for child in data['children']
+            if child['id'] == self.first_folder_id
+        )
+        self.assertEqual((child['fileCount'], child['depth']), (2, 1))
+        with override_settings(NODES_STREAMING=True):
+            response = self.get_node(self.root_id, aggregates='true')
+            self.assertEqual(json.loads(b''.join(
+                response.streaming_content,
+            )), data)
+        response = self.get_node(self.root_id, aggregates='yes')
+        self.assertEqual(response.status_code, HTTP_400_BAD_REQUEST)
+
+    def test_move_and_delete(self):
+        """
+        Проверка пересчета агрегатов при перемещении и удалении.
+        """
+        data = {
+            'items': [
+                {
+                    'type': 'FOLDER',
+                    'id': self.first_folder_id,
+                    'parentId': self.second_folder_id,
+                },
+                {
+                    'type': 'FOLDER',
+                    'id': str(uuid4()),
+                    'parentId': self.first_folder_id,
+                },
+            ],
+            'updateDate': '2022-02-04T12:00:00Z',
+        }
+        self.client.post('/imports', data=data, format='json')
+        self.assertAggregatesConsistent()
+        self.client.delete(
+            reverse('api:delete_item', kwargs={'uuid': self.first_folder_id}),
+        )
+        self.assertAggregatesConsistent()
+        self.assertEqual(
+            Item.objects.get(pk=self.second_folder_id).max_descendant_date,
+            parse_datetime('2022-02-03T15:00:00Z'),
+        )
+
+    def test_move_invalidates_descendants(self):
+        """
+        Проверка того, что после перемещения папки (в том числе через
+        очередь пересчета) /nodes потомков отдает новую глубину,
+        а не ответ из кэша.
+        """
+        url = reverse('api:get_item', kwargs={'uuid': self.file_id})
+        response = self.get_node(self.file_id, aggregates='true')
+        self.assertEqual(json.loads(response.content)['depth'], 2)
+        moves = (
+            (self.second_folder_id, '2022-02-04T12:00:00Z', False, 3),
+            (self.root_id, '2022-02-05T12:00:00Z', True, 2),
+        )
+        for parent_id, date, queue, depth in moves:
+            data = {
+                'items': [
+                    {
+                        'type': 'FOLDER',
+                        'id': self.first_folder_id,
+                        'parentId': parent_id,
+                    },
+                ],
+                'updateDate': date,
+            }
+            with override_settings(PROPAGATION_QUEUE=queue):
+                self.client.post('/imports', data=data, format='json')
+            response = self.client.get(
+                url, {'aggregates': 'true'},
+                HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+            self.assertEqual(response.status_code, HTTP_200_OK)
+            self.assertEqual(json.loads(response.content)['depth'], depth)
+
+    def test_out_of_order_dates(self):
+        """
+        Проверка последней даты поддерева при импортах с более ранней
+        датой, чем у сохраненных элементов, в том числе через очередь.
+        """
+        generator = random.Random(0)
+        folders = [self.root_id, self.first_folder_id, self.second_folder_id]
+        files = list(Item.objects.filter(type='FILE').order_by(
+            'id',
+        ).values_list('id', flat=True))
+        for queue in (False, True):
+            for index in range(20):
+                file_id = generator.choice(files)
+                data = {
+                    'items': [{
+                        'type': 'FILE',
+                        'url': f'/file/{index}',
+                        'id': str(file_id),
+                        'parentId': generator.choice(folders[1:]),
+                        'size': index + 1,
+                    }],
+                    'updateDate': (
+                        f'2022-02-{generator.randint(1, 28):02}T12:00:00Z'
+                    ),
+                }
+                with override_settings(PROPAGATION_QUEUE=queue):
+                    response = self.client.post(
+                        '/imports', data=data, format='json',
+                    )
+                self.assertEqual(response.status_code, HTTP_200_OK)
+                if not queue:
+                    self.assertAggregatesConsistent()
+            process_jobs()
+            self.assertAggregatesConsistent()
+
+    def test_backfill(self):
+        """
+        Проверка заполнения агрегатов миграцией.
+        """
+        migration = import_module('items.migrations.0005_item_aggregates')
+        Item.objects.update(
+            file_count=0, folder_count=0, depth=0, max_descendant_date=None,
+        )
+        migration.fill_aggregates(apps, None)
+        self.assertAggregatesConsistent()
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.post(
+            reverse('api:import_items'), IMPORT_BATCHES[0], format='json',
+        )
+        self.root_id = IMPORT_BATCHES[0]['items'][0]['id']
+
+    def get_sample(self, name, labels=None):
+        return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+    def test_request_metrics(self):
+        """
+        Проверка метрик запроса и их выдачи на /metrics.
+        """
+        labels = {'view': 'get_item', 'method': 'GET', 'status': '200'}
+        count = self.get_sample(
+            'ya_disk_request_duration_seconds_count', labels,
+        )
+        batches = self.get_sample('ya_disk_import_batch_size_count')
+        self.client.get(
+            reverse('api:get_item', kwargs={'uuid': self.root_id}),
+        )
+        self.client.post(
+            reverse('api:import_items'), IMPORT_BATCHES[1], format='json',
+        )
+        self.assertEqual(
+            self.get_sample('ya_disk_request_duration_seconds_count', labels),
+            count + 1,
+        )
+        self.assertEqual(
+            self.get_sample('ya_disk_import_batch_size_count'), batches + 1,
+        )
+        response = self.client.get(reverse('api:metrics'))
+        self.assertEqual(response.status_code, HTTP_200_OK)
+        content = response.content.decode()
+        self.assertIn('ya_disk_request_duration_seconds_bucket', content)
+        self.assertIn('ya_disk_db_queries_bucket{', content)
+        self.assertIn('ya_disk_nodes_cache_requests_total', content)
+
+    @override_settings(NODES_STREAMING=True)
+    def test_streaming_metrics(self):
+        """
+        Проверка того, что метрики потокового ответа записываются после
+        его отдачи.
+        """
+        labels = {'view': 'get_item'}
+        count = self.get_sample('ya_disk_response_size_bytes_count', labels)
+        size = self.get_sample('ya_disk_response_size_bytes_sum', labels)
+        response = self.client.get(
+            reverse('api:get_item', kwargs={'uuid': self.root_id}),
+        )
+        self.assertEqual(
+            self.get_sample('ya_disk_response_size_bytes_count', labels),
+            count,
+        )
+        content = b''.join(response.streaming_content)
+        self.assertEqual(
+            self.get_sample('ya_disk_response_size_bytes_count', labels),
+            count + 1,
+        )
+        self.assertEqual(
+            self.get_sample('ya_disk_response_size_bytes_sum', labels),
+            size + len(content),
+        )
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing(self):
+        """
+        Проверка заголовка Server-Timing.
+        """
+        response = self.client.get(
+            reverse('api:get_item', kwargs={'uuid': self.root_id}),
+        )
+        names = [
+            part.split(';')[0].strip()
+            for part in response['Server-Timing'].split(',')
+        ]
+        self.assertEqual(names, ['db', 'app', 'total'])
+
+    def test_server_timing_disabled(self):
+        response = self.client.get(
+            reverse('api:get_item', kwargs={'uuid': self.root_id}),
+        )
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -1,7 +1,7 @@
 from django.urls import path
 
 from .views import (
-    delete_item, get_history, get_item, get_updates, import_items
+    delete_item, get_history, get_item, get_updates, import_items, metrics
 )
 
 app_name = 'api'
@@ -12,4 +12,5 @@ urlpatterns = [
     path('nodes/<slug:uuid>', get_item, name='get_item'),
     path('updates', get_updates, name='get_updates'),
     path('node/<slug:uuid>/history', get_history, name='get_history'),
+    path('metrics', metrics, name='metrics'),
 ]
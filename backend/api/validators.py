@@ -1,8 +1,12 @@
+import re
 from datetime import datetime
 from uuid import UUID
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from items.models import CHOICES, FILE
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from rest_framework.fields import DateTimeField, empty
 
 
 def validate_uuid(uuid, version=4):
@@ -17,3 +21,142 @@ def validate_date(date):
         _ = datetime.strptime(date, settings.DATE_TIME_FORMAT)
     except ValueError:
         raise ValidationError('Дата обрабатывается согласно ISO 8601')
+
+
+def parse_flag(value):
+    """
+    Разбор необязательного логического параметра запроса.
+    """
+    if value in (None, 'false', '0'):
+        return False
+    if value in ('true', '1'):
+        return True
+    raise ValidationError('Недопустимое значение флага')
+
+
+RE_DECIMAL = re.compile(r'\.0*\s*$')
+RE_SURROGATE = re.compile('[\ud800-\udfff]')
+ITEM_TYPES = {str(value): value for value, _ in CHOICES}
+URL_MAX_LENGTH = 255
+INTEGER_MAX_STRING_LENGTH = 1000
+UPDATE_DATE_FIELD = DateTimeField()
+
+
+def parse_uuid(value):
+    """
+    Разбор UUID по правилам UUIDField.
+    """
+    if isinstance(value, UUID):
+        return value
+    try:
+        if isinstance(value, int):
+            return UUID(int=value)
+        if isinstance(value, str):
+            return UUID(hex=value)
+    except ValueError:
+        pass
+    raise ValidationError('Недопустимый UUID')
+
+
+def parse_url(value):
+    """
+    Разбор url по правилам CharField(max_length=255) и
+    ItemImportSerializer.validate_url.
+    """
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValidationError('Недопустимый url')
+    value = str(value).strip()
+    if (not value or len(value) > URL_MAX_LENGTH or value[0] != '/'
+            or '\x00' in value or RE_SURROGATE.search(value)):
+        raise ValidationError('Недопустимый url')
+    return value
+
+
+def parse_size(value):
+    """
+    Разбор размера по правилам IntegerField и
+    ItemImportSerializer.validate_size.
+    """
+    if type(value) is not int:
+        if (isinstance(value, str)
+                and len(value) > INTEGER_MAX_STRING_LENGTH):
+            raise ValidationError('Недопустимое значение размера')
+        try:
+            value = int(RE_DECIMAL.sub('', str(value)))
+        except (ValueError, TypeError):
+            raise ValidationError('Недопустимое значение размера')
+    if value <= 0:
+        raise ValidationError('Недопустимое значение размера')
+    return value
+
+
+def parse_parent(value, parents):
+    """
+    Разбор parentId с запоминанием уже разобранных значений.
+    """
+    if type(value) is not str:
+        return parse_uuid(value) if value is not None else None
+    if value not in parents:
+        parents[value] = parse_uuid(value)
+    return parents[value]
+
+
+def validate_import_item(item, parents):
+    """
+    Проверяет элемент запроса /imports по тем же правилам, что
+    ItemImportSerializer, и возвращает словарь того же вида.
+    parents - уже разобранные parentId запроса: у соседних элементов
+    обычно общий родитель.
+    """
+    if not isinstance(item, dict):
+        raise ValidationError('Элемент должен быть объектом')
+    item_type = item.get('type')
+    if item_type is None or str(item_type) not in ITEM_TYPES:
+        raise ValidationError('Недопустимый тип элемента')
+    item_type = ITEM_TYPES[str(item_type)]
+    if item.get('id') is None:
+        raise ValidationError('Отсутствует id элемента')
+    data = {
+        'id': parse_uuid(item['id']),
+        'parent': parse_parent(item.get('parentId'), parents),
+        'url': parse_url(item['url']) if 'url' in item else None,
+        'size': parse_size(item['size']) if 'size' in item else None,
+        'type': item_type,
+    }
+    if item_type == FILE:
+        if data['size'] is None:
+            raise ValidationError('У файла должен быть размер')
+        if data['parent'] is None:
+            raise ValidationError('У файла должна быть родительская папка')
+    elif data['size'] or data['url']:
+        raise ValidationError('У папки не может быть размера и url')
+    return data
+
+
+def validate_import_request(data):
+    """
+    Проверяет тело запроса /imports за один проход по элементам без
+    создания сериализаторов. Правила и результат совпадают
+    с ItemRequestImportSerializer: словарь с ключами items и updateDate.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError('Тело запроса должно быть объектом')
+    items = data.get('items')
+    if not isinstance(items, list):
+        raise ValidationError('Поле items должно быть списком')
+    try:
+        update_date = UPDATE_DATE_FIELD.run_validation(
+            data.get('updateDate', empty),
+        )
+    except DRFValidationError:
+        raise ValidationError('Дата обрабатывается согласно ISO 8601')
+    validated_items, ids, parents = [], set(), {}
+    for item in items:
+        item = validate_import_item(item, parents)
+        if item['id'] in ids:
+            raise ValidationError(
+                'В запросе id элементов не должны повторяться'
+            )
+        ids.add(item['id'])
+        validated_items.append(item)
+    return {'items': validated_items, 'updateDate': update_date}
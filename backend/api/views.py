@@ -1,32 +1,99 @@
+from datetime import timezone
+from itertools import chain
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from items.models import FILE, Item
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from items.models import History, Item
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK
+from rest_framework.utils.html import is_html_input
 
+from .cache import (
+    get_cached_response, get_node_etag, get_node_version, invalidate_nodes,
+    set_cached_response
+)
+from .group_commit import ImportRejected, group_committer
+from .metrics import IMPORT_BATCH_SIZE, render_metrics
+from .pagination import KeysetPagination
+from .propagation import (
+    JOB_HEADER, drain_jobs, enqueue_propagation, get_job_token, needs_drain,
+    wait_for_job
+)
+from .renderers import render_tree_stream
 from .serializers import (
     HistorySerializer, ItemRequestImportSerializer, ItemSerializer
 )
 from .services import (
     RESPONSE_ITEM_NOT_FOUND, RESPONSE_OK, RESPONSE_VALIDATION_ERROR,
-    get_date_range, get_datetime_object, get_uuid,
-    save_updated_items_in_history, update_folders_date, update_sizes
+    check_validators, delete_subtree, get_datetime_object, get_descendants,
+    get_history_etag, get_history_item, get_history_queryset,
+    get_updates_queryset, get_uuid, iter_subtree_rows, merge_history,
+    read_history_archive, save_updated_items_in_history, set_validators,
+    update_descendant_dates, update_folders_date, update_sizes
+)
+from .validators import (
+    parse_flag, validate_date, validate_import_request, validate_uuid
 )
-from .validators import validate_date, validate_uuid
+
+
+def stream_item(request, uuid, etag, aggregates):
+    """
+    Отдает поддерево элемента потоком, без кэширования тела ответа.
+    """
+    rows = iter_subtree_rows(uuid, aggregates=aggregates)
+    root = next(rows, None)
+    if root is None:
+        rows.close()
+        return RESPONSE_ITEM_NOT_FOUND
+    date = root[3]
+    not_modified = check_validators(request, etag, date)
+    if not_modified:
+        rows.close()
+        return not_modified
+    response = StreamingHttpResponse(
+        render_tree_stream(chain([root], rows), aggregates=aggregates),
+        content_type='application/json',
+    )
+    return set_validators(response, etag, date)
 
 
 @api_view(['GET'])
 def get_item(request, uuid):
     try:
         validate_uuid(uuid)
+        aggregates = parse_flag(request.GET.get('aggregates'))
+        wait_for_job(get_job_token(request))
     except ValidationError:
         return RESPONSE_VALIDATION_ERROR
-    try:
-        item = Item.objects.get(pk=uuid)
-    except Item.DoesNotExist:
-        return RESPONSE_ITEM_NOT_FOUND
-    serializer = ItemSerializer(item)
-    return Response(serializer.data, status=HTTP_200_OK)
+    version = get_node_version(uuid)
+    if aggregates:
+        version = f'{version}-aggregates'
+    etag = get_node_etag(uuid, version)
+    not_modified = check_validators(request, etag)
+    if not_modified:
+        return not_modified
+    if settings.NODES_STREAMING:
+        return stream_item(request, uuid, etag, aggregates)
+    cached = get_cached_response(uuid, version)
+    if cached is None:
+        rows = iter_subtree_rows(uuid, aggregates=aggregates)
+        root = next(rows, None)
+        if root is None:
+            rows.close()
+            return RESPONSE_ITEM_NOT_FOUND
+        cached = b''.join(render_tree_stream(
+            chain([root], rows), aggregates=aggregates,
+        )), root[3]
+        set_cached_response(uuid, version, *cached)
+    content, date = cached
+    not_modified = check_validators(request, etag, date)
+    if not_modified:
+        return not_modified
+    response = HttpResponse(content, content_type='application/json')
+    return set_validators(response, etag, date)
 
 
 @api_view(['DELETE'])
@@ -39,25 +106,78 @@ def delete_item(request, uuid):
         item = Item.objects.get(pk=uuid)
     except Item.DoesNotExist:
         return RESPONSE_ITEM_NOT_FOUND
-    item.delete()
+    with transaction.atomic():
+        if settings.PROPAGATION_QUEUE:
+            drain_jobs()
+            item.refresh_from_db()
+        subtree_ids = list(
+            get_descendants(uuid, include_self=True).values_list(
+                'id', flat=True,
+            ).iterator()
+        )
+        ancestors_ids = delete_subtree(item)
+    invalidate_nodes([*subtree_ids, *ancestors_ids])
     return RESPONSE_OK
 
 
+def save_import(validated_data):
+    """
+    Записывает импорт и пересчитывает даты, размеры и историю предков
+    (или ставит пересчет в очередь). Возвращает задание очереди или None.
+    """
+    items = validated_data.get('items')
+    update_date = validated_data.get('updateDate')
+    job = None
+    with transaction.atomic():
+        if settings.PROPAGATION_QUEUE and needs_drain(items):
+            drain_jobs()
+        try:
+            instance = ItemRequestImportSerializer().create(validated_data)
+        except Exception as error:
+            raise ImportRejected from error
+        if settings.PROPAGATION_QUEUE:
+            job = enqueue_propagation(instance, items, update_date)
+        else:
+            update_folders_date(items, update_date)
+            update_sizes(instance.size_deltas, instance.abandoned_folders)
+            update_descendant_dates(instance.moved_parents)
+            save_updated_items_in_history(items)
+    invalidate_nodes(instance.affected_ids)
+    return job
+
+
 @api_view(['POST'])
 def import_items(request):
     serializer = ItemRequestImportSerializer(data=request.data)
-    if not serializer.is_valid():
-        return RESPONSE_VALIDATION_ERROR
+    if is_html_input(request.data):
+        if not serializer.is_valid():
+            return RESPONSE_VALIDATION_ERROR
+        validated_data = serializer.validated_data
+    else:
+        try:
+            validated_data = validate_import_request(request.data)
+        except ValidationError:
+            return RESPONSE_VALIDATION_ERROR
+    IMPORT_BATCH_SIZE.observe(len(validated_data.get('items')))
+    save = save_import
+    if settings.IMPORT_GROUP_COMMIT:
+        save = group_committer.submit
     try:
-        serializer.save()
-    except Exception:
+        job = save(validated_data)
+    except ImportRejected:
         return RESPONSE_VALIDATION_ERROR
-    update_date = serializer.validated_data.get('updateDate')
-    items = serializer.validated_data.get('items')
-    update_folders_date(items, update_date)
-    update_sizes()
-    save_updated_items_in_history(update_date)
-    return RESPONSE_OK
+    return get_import_response(job)
+
+
+def get_import_response(job):
+    """
+    Ответ /imports; при отложенном пересчете с токеном задания.
+    """
+    if job is None:
+        return RESPONSE_OK
+    response = Response(status=HTTP_200_OK)
+    response[JOB_HEADER] = str(job.pk)
+    return response
 
 
 @api_view(['GET'])
@@ -65,12 +185,21 @@ def get_updates(request):
     date = request.GET.get('date')
     try:
         validate_date(date)
+        wait_for_job(get_job_token(request))
     except ValidationError:
         return RESPONSE_VALIDATION_ERROR
-    date_range = get_date_range(date)
-    queryset = Item.objects.filter(date__range=date_range).filter(type=FILE)
+    try:
+        pagination = KeysetPagination(request, Item)
+    except ValidationError:
+        return RESPONSE_VALIDATION_ERROR
+    queryset = get_updates_queryset(date, pagination)
+    if pagination.enabled:
+        queryset = pagination.get_page(list(queryset))
     serializer = ItemSerializer(queryset, many=True)
-    return Response({'items': serializer.data}, status=HTTP_200_OK)
+    return Response(
+        pagination.get_response_data(serializer.data),
+        status=HTTP_200_OK,
+    )
 
 
 @api_view(['GET'])
@@ -81,14 +210,34 @@ def get_history(request, uuid):
         validate_uuid(uuid)
         validate_date(request.GET.get('dateStart'))
         validate_date(request.GET.get('dateEnd'))
+        pagination = KeysetPagination(request, History)
+        wait_for_job(get_job_token(request))
     except ValidationError:
         return RESPONSE_VALIDATION_ERROR
-    try:
-        item = Item.objects.get(pk=uuid)
-    except Item.DoesNotExist:
+    item = get_history_item(uuid).first()
+    if item is None:
         return RESPONSE_ITEM_NOT_FOUND
-    queryset = item.history.all().filter(
-        date__range=(date_start, date_end)
+    etag = get_history_etag(item)
+    not_modified = check_validators(request, etag, item.date)
+    if not_modified:
+        return not_modified
+    date_start, date_end = (
+        get_datetime_object(date).replace(tzinfo=timezone.utc)
+        for date in (date_start, date_end)
+    )
+    archived = read_history_archive(item.id, date_start, date_end, pagination)
+    live = get_history_queryset(
+        item.id, date_start, date_end, pagination, archived,
     )
-    serializer = HistorySerializer(queryset, many=True)
-    return Response({'items': serializer.data}, status=HTTP_200_OK)
+    history = merge_history(pagination, archived, list(live))
+    serializer = HistorySerializer(history, many=True)
+    response = Response(
+        pagination.get_response_data(serializer.data),
+        status=HTTP_200_OK,
+    )
+    return set_validators(response, etag, item.date)
+
+
+def metrics(request):
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
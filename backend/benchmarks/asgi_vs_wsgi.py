@@ -0,0 +1,115 @@
+"""
+Сравнение WSGI (gunicorn) и ASGI (uvicorn) развертываний на чтении.
+
+Оба сервера запускаются с текущими настройками базы данных (DB_ENGINE,
+DB_NAME, DB_HOST и т.д.), асинхронные эндпоинты работают только
+на PostgreSQL:
+    python -m benchmarks.asgi_vs_wsgi --items 20000 --concurrency 1,16,64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.load_test import (
+    BASE_DIR, Client, Stats, Workload, get_free_port, get_wsgi_command,
+    parse_list, parse_mix, run_workload, seed_forest, start_server
+)
+from benchmarks.tree_generator import DateSequence, ForestGenerator
+
+DEFAULT_MIX = 'nodes=60,updates=20,history=20'
+
+
+def get_asgi_command(port, workers):
+    return ['-m', 'uvicorn', 'ya_disk.asgi:application',
+            '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--no-access-log']
+
+
+def print_comparison(results):
+    row = '{:<8}{:<10}{:>10}{:>10}{:>10}{:>10}{:>10}{:>10}'
+    print(row.format(
+        'conc', 'operation', 'wsgi rps', 'asgi rps',
+        'wsgi p50', 'asgi p50', 'wsgi p99', 'asgi p99',
+    ))
+    for concurrency, servers in results.items():
+        wsgi, asgi = servers['wsgi'], servers['asgi']
+        for name in wsgi:
+            print(row.format(
+                concurrency, name,
+                *(str(report[name][key])
+                  for key in ('rps', 'p50', 'p99')
+                  for report in (wsgi, asgi)),
+            ))
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=2,
+                        help='число процессов у каждого сервера')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--concurrency', type=parse_list,
+                        default=[1, 16, 64])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    mix = parse_mix(args.mix)
+    env = dict(os.environ, DEBUG='False')
+    subprocess.run(
+        [sys.executable, 'manage.py', 'migrate', '-v', '0'],
+        cwd=BASE_DIR, env=env, check=True,
+    )
+    servers = {}
+    try:
+        for name, get_command in (
+            ('wsgi', get_wsgi_command), ('asgi', get_asgi_command),
+        ):
+            port = get_free_port()
+            servers[name] = start_server(
+                get_command(port, args.workers), port, env,
+            )
+        forest = ForestGenerator(
+            args.items, depth=args.depth, fanout=args.fanout, seed=args.seed,
+        )
+        dates = DateSequence()
+        clients = {name: Client(url) for name, (_, url) in servers.items()}
+        started = time.perf_counter()
+        seed_forest(clients['wsgi'], forest, dates, args.batch_size, Stats())
+        print(f'лес загружен за {time.perf_counter() - started:.1f} с',
+              file=sys.stderr)
+
+        results = {}
+        for concurrency in args.concurrency:
+            results[concurrency] = {
+                name: run_workload(
+                    Workload(client, forest, dates, seed=args.seed),
+                    mix, concurrency, args.duration,
+                )
+                for name, client in clients.items()
+            }
+    finally:
+        for process, _ in servers.values():
+            process.terminate()
+            process.wait()
+    print_comparison(results)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(
+                {'config': vars(args), 'results': results}, file, indent=2,
+            )
+    return results
+
+
+if __name__ == '__main__':
+    main()
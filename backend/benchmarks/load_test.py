@@ -0,0 +1,366 @@
+"""
+Нагрузочный тест API на синтетическом лесе.
+
+Запуск против уже работающего сервера:
+    python -m benchmarks.load_test --url http://localhost:80
+
+Запуск с локальным сервером на SQLite (база создается заново):
+    python -m benchmarks.load_test --serve-sqlite /tmp/load.sqlite3
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from benchmarks.tree_generator import (
+    SIZE_DISTRIBUTIONS, DateSequence, ForestGenerator, format_date
+)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+START = DateSequence().date
+OPERATIONS = ('nodes', 'updates', 'history', 'imports', 'delete')
+DEFAULT_MIX = 'nodes=50,updates=20,history=15,imports=10,delete=5'
+PERCENTILES = (50, 95, 99)
+# 404 возможен, если элемент удален параллельным запросом.
+EXPECTED_STATUSES = (200, 304, 404)
+
+
+def percentile(values, percent):
+    """
+    Перцентиль по методу ближайшего ранга.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(1, round(percent / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, weight = part.split('=')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f'Неизвестная операция: {name}')
+        mix[name] = float(weight)
+    return mix
+
+
+def parse_list(value):
+    return [int(part) for part in value.split(',')]
+
+
+class Client:
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, data=None):
+        body = None
+        headers = {}
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(
+            self.url + path, data=body, method=method, headers=headers
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as r:
+                return r.status, r.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+
+class Stats:
+    """
+    Задержки и статусы ответов по операциям, потокобезопасно.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, latency, status):
+        with self.lock:
+            self.latencies[name].append(latency)
+            if status not in EXPECTED_STATUSES:
+                self.errors[name] += 1
+
+    def report(self, elapsed):
+        result = {}
+        names = sorted(self.latencies)
+        for name in names + ['total']:
+            if name == 'total':
+                values = [v for n in names for v in self.latencies[n]]
+                errors = sum(self.errors.values())
+            else:
+                values = self.latencies[name]
+                errors = self.errors[name]
+            row = {
+                'requests': len(values),
+                'errors': errors,
+                'rps': round(len(values) / elapsed, 2) if elapsed else None,
+            }
+            for percent in PERCENTILES:
+                value = percentile(values, percent)
+                row[f'p{percent}'] = (
+                    round(value * 1000, 2) if value is not None else None
+                )
+            result[name] = row
+        return result
+
+
+class Workload:
+    """
+    Смешанная нагрузка по загруженному лесу.
+    """
+    def __init__(self, client, forest, dates, seed=None):
+        self.client = client
+        self.forest = forest
+        self.dates = dates
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def choice(self, items):
+        with self.lock:
+            return self.random.choice(items) if items else None
+
+    def next_date(self):
+        with self.lock:
+            return next(self.dates)
+
+    def nodes(self):
+        item_id = self.choice(self.forest.folders)
+        return self.client.request('GET', f'/nodes/{item_id}')
+
+    def updates(self):
+        date = format_date(self.dates.date)
+        return self.client.request('GET', f'/updates?date={date}')
+
+    def history(self):
+        item_id = self.choice(self.forest.files)
+        end = self.dates.date + timedelta(seconds=1)
+        return self.client.request(
+            'GET',
+            f'/node/{item_id}/history?dateStart={format_date(START)}'
+            f'&dateEnd={format_date(end)}'
+        )
+
+    def imports(self):
+        with self.lock:
+            if not self.forest.files:
+                return 0, b''
+            item_id = self.random.choice(self.forest.files)
+            item = {
+                'type': 'FILE',
+                'id': item_id,
+                'parentId': self.forest.parents[item_id],
+                'url': f'/file/{item_id}',
+                'size': self.forest.get_size(),
+            }
+            date = next(self.dates)
+        return self.client.request(
+            'POST', '/imports', {'items': [item], 'updateDate': date}
+        )
+
+    def delete(self):
+        with self.lock:
+            if not self.forest.files:
+                return 0, b''
+            index = self.random.randrange(len(self.forest.files))
+            files = self.forest.files
+            files[index], files[-1] = files[-1], files[index]
+            item_id = files.pop()
+            date = next(self.dates)
+        return self.client.request(
+            'DELETE', f'/delete/{item_id}?date={date}'
+        )
+
+
+def seed_forest(client, forest, dates, batch_size, stats):
+    for batch in forest.batches(batch_size, dates):
+        started = time.perf_counter()
+        status, body = client.request('POST', '/imports', batch)
+        stats.add('seed_imports', time.perf_counter() - started, status)
+        if status != 200:
+            raise RuntimeError(f'Ошибка загрузки леса: {status} {body!r}')
+
+
+def run_workload(workload, mix, concurrency, duration):
+    stats = Stats()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, _ = getattr(workload, name)()
+            except OSError:
+                status = -1
+            stats.add(name, time.perf_counter() - started, status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    return stats.report(time.perf_counter() - started)
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve_sqlite(path, workers):
+    """
+    Создает новую SQLite-базу, применяет миграции и запускает
+    WSGI-сервер.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    env = dict(
+        os.environ,
+        DB_ENGINE='django.db.backends.sqlite3',
+        DB_NAME=path,
+        DEBUG='False',
+    )
+    subprocess.run(
+        [sys.executable, 'manage.py', 'migrate', '-v', '0'],
+        cwd=BASE_DIR, env=env, check=True
+    )
+    port = get_free_port()
+    return start_server(get_wsgi_command(port, workers), port, env)
+
+
+def get_wsgi_command(port, workers):
+    """
+    Команда запуска WSGI-сервера: gunicorn или runserver,
+    если gunicorn не установлен.
+    """
+    if importlib.util.find_spec('gunicorn'):
+        return ['-m', 'gunicorn', 'ya_disk.wsgi:application',
+                '--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    return ['manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+
+
+def start_server(command, port, env=None):
+    """
+    Запускает сервер и ждет, пока он начнет принимать соединения.
+    """
+    process = subprocess.Popen(
+        [sys.executable, *command], cwd=BASE_DIR, env=env
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        if process.poll() is not None:
+            break
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('Сервер не запустился')
+
+
+def print_report(concurrency, report):
+    print(f'\nconcurrency={concurrency}')
+    header = ('operation', 'requests', 'errors', 'rps', 'p50', 'p95', 'p99')
+    print('{:<14}{:>10}{:>8}{:>10}{:>10}{:>10}{:>10}'.format(*header))
+    for name, row in report.items():
+        print('{:<14}{:>10}{:>8}{:>10}{:>10}{:>10}{:>10}'.format(
+            name, *(str(row[key]) for key in header[1:])
+        ))
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://localhost:80')
+    parser.add_argument('--serve-sqlite', metavar='PATH')
+    parser.add_argument('--server-workers', type=int, default=2)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--folder-ratio', type=float, default=0.2)
+    parser.add_argument('--size-distribution', default='lognormal',
+                        choices=SIZE_DISTRIBUTIONS)
+    parser.add_argument('--mean-size', type=int, default=4096)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='веса операций, например nodes=50,imports=10')
+    parser.add_argument('--concurrency', type=parse_list, default=[1, 4, 16],
+                        help='уровни параллелизма через запятую')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='длительность каждого уровня, секунд')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH',
+                        help='сохранить результаты в файл')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if isinstance(args.mix, str):
+        args.mix = parse_mix(args.mix)
+    process = None
+    if args.serve_sqlite:
+        process, args.url = serve_sqlite(
+            args.serve_sqlite, args.server_workers
+        )
+    try:
+        client = Client(args.url)
+        forest = ForestGenerator(
+            args.items, depth=args.depth, fanout=args.fanout,
+            folder_ratio=args.folder_ratio,
+            size_distribution=args.size_distribution,
+            mean_size=args.mean_size, seed=args.seed,
+        )
+        dates = DateSequence()
+        seed_stats = Stats()
+        started = time.perf_counter()
+        seed_forest(client, forest, dates, args.batch_size, seed_stats)
+        seed_report = seed_stats.report(time.perf_counter() - started)
+        print_report('seed', seed_report)
+
+        workload = Workload(client, forest, dates, seed=args.seed)
+        results = {'seed': seed_report, 'runs': {}}
+        for concurrency in args.concurrency:
+            report = run_workload(
+                workload, args.mix, concurrency, args.duration
+            )
+            results['runs'][concurrency] = report
+            print_report(concurrency, report)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    results['config'] = {
+        key: value for key, value in vars(args).items() if key != 'json'
+    }
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+    return results
+
+
+if __name__ == '__main__':
+    main()
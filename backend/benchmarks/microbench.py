@@ -0,0 +1,285 @@
+"""
+Микробенчмарки функций api.services и сериализаторов.
+
+Запуск (тестовая база создается и удаляется автоматически):
+    python -m benchmarks.microbench --output results.json
+Сравнение с результатами другого коммита:
+    python -m benchmarks.microbench --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Формы деревьев: имя -> параметры ForestGenerator.
+SHAPES = {
+    'wide': {'depth': 2, 'fanout': 100, 'folder_ratio': 0.1},
+    'balanced': {'depth': 6, 'fanout': 8, 'folder_ratio': 0.3},
+    'deep': {'depth': 100, 'fanout': 2, 'folder_ratio': 0.55},
+}
+SIZES = (1000, 10000)
+UPDATE_BATCH = 100
+
+
+class QueryCounter:
+    """
+    Обертка execute_wrapper, считающая запросы без накладных расходов
+    на сохранение их текста.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def rollback():
+    from django.db import transaction
+
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(run, setup=None, repeat=5):
+    """
+    Выполняет run repeat раз, каждый раз в откатываемой транзакции.
+    Время и число запросов setup не учитываются.
+    """
+    from django.db import connection
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        with rollback():
+            args = setup() if setup else ()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                run(*args)
+                timings.append(time.perf_counter() - started)
+            queries.append(counter.count)
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'queries': max(queries),
+    }
+
+
+def import_batch(batch):
+    """
+    Полный цикл импорта, как в представлении import_items.
+    """
+    from api.validators import validate_import_request
+    from api.views import save_import
+
+    save_import(validate_import_request(batch))
+
+
+def get_update_batch(forest, dates):
+    """
+    Запрос /imports, обновляющий UPDATE_BATCH файлов со всего дерева.
+    """
+    step = max(1, len(forest.files) // UPDATE_BATCH)
+    items = [
+        {
+            'type': 'FILE',
+            'id': item_id,
+            'parentId': forest.parents[item_id],
+            'url': f'/file/{item_id}',
+            'size': forest.get_size(),
+        }
+        for item_id in forest.files[::step][:UPDATE_BATCH]
+    ]
+    return {'items': items, 'updateDate': next(dates)}
+
+
+def validated(batch):
+    from api.serializers import ItemRequestImportSerializer
+
+    serializer = ItemRequestImportSerializer(data=batch)
+    serializer.is_valid(raise_exception=True)
+    return serializer
+
+
+def run_cases(forest, dates, repeat):
+    from api.serializers import ItemSerializer
+    from api.services import (
+        save_updated_items_in_history, update_folders_date, update_sizes
+    )
+    from api.validators import validate_import_request
+    from items.models import Item
+
+    root_id = forest.folders[0]
+    batch = get_update_batch(forest, dates)
+
+    def validated_items():
+        serializer = validated(batch)
+        return (
+            serializer.validated_data['items'],
+            serializer.validated_data['updateDate'],
+        )
+
+    def saved():
+        serializer = validated(batch)
+        instance = serializer.save()
+        return instance.size_deltas, instance.abandoned_folders
+
+    return {
+        'import_validate': measure(
+            lambda: validated(batch), repeat=repeat
+        ),
+        'import_validate_fast': measure(
+            lambda: validate_import_request(batch), repeat=repeat
+        ),
+        'import_save': measure(
+            lambda serializer: serializer.save(),
+            setup=lambda: (validated(batch),), repeat=repeat,
+        ),
+        'update_sizes': measure(update_sizes, setup=saved, repeat=repeat),
+        'update_folders_date': measure(
+            update_folders_date, setup=validated_items, repeat=repeat
+        ),
+        'save_updated_items_in_history': measure(
+            lambda items, date: save_updated_items_in_history(items),
+            setup=validated_items,
+            repeat=repeat,
+        ),
+        'import_full': measure(lambda: import_batch(batch), repeat=repeat),
+        'item_serializer': measure(
+            lambda item: ItemSerializer(item).data,
+            setup=lambda: (Item.objects.get(id=root_id),), repeat=repeat,
+        ),
+    }
+
+
+def run(sizes, shapes, repeat, seed):
+    from benchmarks.tree_generator import DateSequence, ForestGenerator
+
+    results = {}
+    for shape in shapes:
+        for size in sizes:
+            forest = ForestGenerator(size, seed=seed, **SHAPES[shape])
+            dates = DateSequence()
+            with rollback():
+                for batch in forest.batches(1000, dates):
+                    import_batch(batch)
+                name = f'{shape}-{size}'
+                results[name] = run_cases(forest, dates, repeat)
+                print(f'{name}: готово', file=sys.stderr)
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, check=True,
+            capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base, results, threshold):
+    """
+    Печатает изменение времени и числа запросов относительно base.
+    Возвращает число регрессий, превышающих порог.
+    """
+    regressions = 0
+    row = '{:<16}{:<32}{:>12}{:>12}{:>9}{:>12}'
+    print(row.format('tree', 'case', 'base ms', 'ms', 'ratio', 'queries'))
+    for tree, cases in results.items():
+        for case, value in cases.items():
+            old = base.get(tree, {}).get(case)
+            if old is None:
+                continue
+            ratio = value['median_ms'] / old['median_ms']
+            mark = ''
+            if (ratio > 1 + threshold
+                    or value['queries'] > old['queries']):
+                regressions += 1
+                mark = ' !'
+            print(row.format(
+                tree, case, old['median_ms'], value['median_ms'],
+                f'{ratio:.2f}', f"{old['queries']}->{value['queries']}",
+            ) + mark)
+    return regressions
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='размеры деревьев через запятую')
+    parser.add_argument('--shapes', default=','.join(SHAPES),
+                        help='формы деревьев: ' + ', '.join(SHAPES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', metavar='PATH',
+                        help='сохранить результаты в JSON')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='JSON с результатами для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='допустимый рост времени, доля')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ya_disk.settings')
+    import django
+    from django.db import connection
+    from django.test.utils import (
+        setup_databases, setup_test_environment, teardown_databases,
+        teardown_test_environment
+    )
+
+    django.setup()
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        results = run(
+            [int(size) for size in args.sizes.split(',')],
+            args.shapes.split(','), args.repeat, args.seed,
+        )
+        vendor = connection.vendor
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+    report = {
+        'commit': get_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': vendor,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as file:
+            base = json.load(file)
+        print(f"\n{base.get('commit')} -> {report['commit']}")
+        if compare(base['results'], results, args.threshold):
+            sys.exit(1)
+    return report
+
+
+if __name__ == '__main__':
+    main()
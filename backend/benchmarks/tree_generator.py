@@ -0,0 +1,123 @@
+import random
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+DATE_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+START_DATE = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+SIZE_DISTRIBUTIONS = ('uniform', 'lognormal', 'pareto')
+
+
+def format_date(date):
+    return date.strftime(DATE_TIME_FORMAT)
+
+
+class DateSequence:
+    """
+    Монотонно возрастающие даты импорта (требование API).
+    """
+    def __init__(self, start=START_DATE, step=timedelta(seconds=1)):
+        self.date = start
+        self.step = step
+
+    def __next__(self):
+        self.date += self.step
+        return format_date(self.date)
+
+    def __iter__(self):
+        return self
+
+
+class ForestGenerator:
+    """
+    Генератор леса папок и файлов заданной формы.
+
+    items - общее число элементов, depth - максимальная глубина,
+    fanout - число дочерних элементов папки, folder_ratio - доля папок
+    среди дочерних элементов (на последнем уровне создаются только файлы),
+    size_distribution - распределение размеров файлов.
+    """
+    def __init__(self, items, depth=5, fanout=10, folder_ratio=0.2,
+                 size_distribution='lognormal', mean_size=4096, seed=None):
+        if size_distribution not in SIZE_DISTRIBUTIONS:
+            raise ValueError(f'Неизвестное распределение: {size_distribution}')
+        self.items = items
+        self.depth = depth
+        self.fanout = fanout
+        self.folder_ratio = folder_ratio
+        self.size_distribution = size_distribution
+        self.mean_size = mean_size
+        self.random = random.Random(seed)
+        self.folders = []
+        self.files = []
+        self.parents = {}
+
+    def new_id(self):
+        return str(UUID(int=self.random.getrandbits(128), version=4))
+
+    def get_size(self):
+        if self.size_distribution == 'uniform':
+            size = self.random.uniform(1, 2 * self.mean_size)
+        elif self.size_distribution == 'lognormal':
+            size = self.random.lognormvariate(0, 1) * self.mean_size / 1.65
+        else:
+            size = self.random.paretovariate(1.5) * self.mean_size / 3
+        return max(1, int(size))
+
+    def new_folder(self, parent_id):
+        item = {'type': 'FOLDER', 'id': self.new_id(), 'parentId': parent_id}
+        self.folders.append(item['id'])
+        self.parents[item['id']] = parent_id
+        return item
+
+    def new_file(self, parent_id):
+        item = {
+            'type': 'FILE',
+            'id': self.new_id(),
+            'parentId': parent_id,
+            'url': f'/file/{len(self.files)}',
+            'size': self.get_size(),
+        }
+        self.files.append(item['id'])
+        self.parents[item['id']] = parent_id
+        return item
+
+    def __iter__(self):
+        """
+        Выдает элементы в порядке обхода в ширину: родитель всегда
+        раньше дочерних элементов.
+        """
+        created = 0
+        queue = deque()
+        while created < self.items:
+            if not queue:
+                root = self.new_folder(None)
+                created += 1
+                queue.append((root['id'], 0))
+                yield root
+                continue
+            folder_id, level = queue.popleft()
+            for _ in range(min(self.fanout, self.items - created)):
+                if (level + 1 < self.depth
+                        and self.random.random() < self.folder_ratio):
+                    item = self.new_folder(folder_id)
+                    queue.append((item['id'], level + 1))
+                else:
+                    item = self.new_file(folder_id)
+                created += 1
+                yield item
+
+    def batches(self, batch_size, dates=None):
+        """
+        Делит лес на запросы /imports по batch_size элементов.
+        """
+        dates = dates or DateSequence()
+        batch = []
+        for item in self:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield {'items': batch, 'updateDate': next(dates)}
+                batch = []
+        if batch:
+            yield {'items': batch, 'updateDate': next(dates)}
@@ -0,0 +1,31 @@
+import os
+import shutil
+import tempfile
+
+# Метрики Prometheus собираются со всех воркеров через общий каталог.
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'ya_disk_metrics'),
+)
+
+# Групповая запись /imports (IMPORT_GROUP_COMMIT) объединяет запросы
+# потоков одного воркера.
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+
+def on_starting(server):
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir)
+    # Кэш /nodes в памяти процесса у каждого воркера свой: импорт,
+    # обработанный одним воркером (или воркером очереди пересчета),
+    # не сбросит ответы другого.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ya_disk.settings')
+    from api.cache import check_shared_cache
+
+    check_shared_cache(server.cfg.workers)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,116 @@
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from itertools import groupby
+from uuid import UUID
+
+from .models import History, HistoryArchiveBlock
+
+DATA_SUFFIX = '.dat'
+
+
+def to_microseconds(date):
+    """
+    Переводит дату в число микросекунд от начала эпохи.
+    """
+    return int(date.timestamp()) * 1000000 + date.microsecond
+
+
+class HistoryArchiveWriter:
+    """
+    Записывает сегмент архива истории: файл сжатых блоков, по блоку
+    на элемент в каждой порции. Расположение и интервал дат блоков
+    хранятся в таблице HistoryArchiveBlock. В имени сегмента хранится
+    граница хранения: все его записи старше нее.
+    """
+    def __init__(self, directory, cutoff):
+        os.makedirs(directory, exist_ok=True)
+        self.name = f'history-{to_microseconds(cutoff)}-{time.time_ns()}'
+        self.data = open(
+            os.path.join(directory, self.name + DATA_SUFFIX), 'ab',
+        )
+
+    def write(self, rows):
+        """
+        Дописывает порцию записей истории, упорядоченных по
+        (item_id, date, id), и сбрасывает ее на диск. Возвращает
+        несохраненные блоки архива для записанной порции.
+        """
+        blocks = []
+        for item_id, item_rows in groupby(rows, key=lambda row: row.item_id):
+            item_rows = list(item_rows)
+            block = zlib.compress(json.dumps([
+                [
+                    row.id,
+                    row.type,
+                    row.date.isoformat(),
+                    row.url,
+                    row.size,
+                    row.parent_id.hex if row.parent_id else None,
+                ] for row in item_rows
+            ], separators=(',', ':')).encode())
+            blocks.append(HistoryArchiveBlock(
+                item_id=item_id,
+                segment=self.name,
+                offset=self.data.tell(),
+                length=len(block),
+                first_date=item_rows[0].date,
+                last_date=item_rows[-1].date,
+            ))
+            self.data.write(block)
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        return blocks
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_item_history(directory, item_id, date_start, date_end):
+    """
+    Возвращает архивные записи истории элемента за интервал
+    [date_start, date_end] в виде несохраненных объектов History.
+    Читаются только блоки элемента, пересекающиеся с интервалом.
+    """
+    blocks = HistoryArchiveBlock.objects.filter(
+        item_id=item_id,
+        last_date__gte=date_start,
+        first_date__lte=date_end,
+    ).order_by('first_date', 'pk')
+    start, end = to_microseconds(date_start), to_microseconds(date_end)
+    item_id = UUID(str(item_id))
+    history, files = [], {}
+    try:
+        for block in blocks:
+            data = files.get(block.segment)
+            if data is None:
+                data = files[block.segment] = open(
+                    os.path.join(directory, block.segment + DATA_SUFFIX),
+                    'rb',
+                )
+            data.seek(block.offset)
+            rows = json.loads(zlib.decompress(data.read(block.length)))
+            for pk, item_type, date, url, size, parent_id in rows:
+                date = datetime.fromisoformat(date)
+                if start <= to_microseconds(date) <= end:
+                    history.append(History(
+                        id=pk,
+                        type=item_type,
+                        date=date.astimezone(timezone.utc),
+                        url=url,
+                        size=size,
+                        parent_id=UUID(parent_id) if parent_id else None,
+                        item_id=item_id,
+                    ))
+    finally:
+        for data in files.values():
+            data.close()
+    return history
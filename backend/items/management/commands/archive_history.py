@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from items.archive import HistoryArchiveWriter
+from items.models import History, HistoryArchiveBlock
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит записи истории старше срока хранения '
+        'в сжатый архив на диске.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.HISTORY_RETENTION_DAYS,
+            help='Срок хранения истории в таблице, дней.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Количество записей, переносимых в одной транзакции.',
+        )
+        parser.add_argument(
+            '--directory',
+            default=settings.HISTORY_ARCHIVE_DIR,
+            help='Каталог архива.',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        queryset = History.objects.filter(date__lt=cutoff).order_by(
+            'item_id', 'date', 'id',
+        )
+        archived, last = 0, None
+        with HistoryArchiveWriter(options['directory'], cutoff) as writer:
+            while True:
+                chunk = queryset
+                if last is not None:
+                    chunk = chunk.filter(
+                        Q(item_id__gt=last.item_id)
+                        | Q(item_id=last.item_id, date__gt=last.date)
+                        | Q(
+                            item_id=last.item_id,
+                            date=last.date,
+                            id__gt=last.id,
+                        )
+                    )
+                with transaction.atomic():
+                    rows = list(chunk[:options['chunk_size']])
+                    if not rows:
+                        break
+                    HistoryArchiveBlock.objects.bulk_create(
+                        writer.write(rows),
+                    )
+                    History.objects.filter(
+                        pk__in=[row.id for row in rows],
+                        date__lt=cutoff,
+                    ).delete()
+                archived += len(rows)
+                last = rows[-1]
+        self.stdout.write(f'Перенесено в архив записей: {archived}')
@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone as django_timezone
+from items.partitions import (
+    detach_history_partition, ensure_history_partitions,
+    get_history_partitions, is_history_partitioned
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает месячные секции истории на будущие месяцы '
+        'и отсоединяет (удаляет) старые секции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=settings.HISTORY_PARTITIONS_AHEAD,
+            help='На сколько месяцев вперед создать секции.',
+        )
+        parser.add_argument(
+            '--detach-before',
+            help='Отсоединить секции за месяцы раньше указанного (ГГГГ-ММ).',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Удалить отсоединенные секции.',
+        )
+
+    def handle(self, *args, **options):
+        if not is_history_partitioned():
+            raise CommandError('Таблица истории не секционирована')
+        ensure_history_partitions(django_timezone.now(), options['ahead'])
+        if not options['detach_before']:
+            return
+        try:
+            before = datetime.strptime(
+                options['detach_before'], '%Y-%m',
+            ).replace(tzinfo=timezone.utc)
+        except ValueError:
+            raise CommandError('Месяц указывается в формате ГГГГ-ММ')
+        for name, month in get_history_partitions():
+            if month < before:
+                detach_history_partition(name, drop=options['drop'])
+                self.stdout.write(f'Отсоединена секция {name}')
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.19 on 2026-10-18 06:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_closure(apps, schema_editor):
+    """
+    Заполняет таблицу замыкания по существующим связям parent,
+    по одному уровню вложенности за раз.
+    """
+    Item = apps.get_model('items', 'Item')
+    ItemClosure = apps.get_model('items', 'ItemClosure')
+    parents = {
+        item_id: None
+        for item_id in Item.objects.filter(parent=None).values_list(
+            'id', flat=True,
+        )
+    }
+    parent_ancestors = {None: []}
+    while parents:
+        ancestors, links = {}, []
+        for item_id, parent_id in parents.items():
+            ancestors[item_id] = [item_id, *parent_ancestors[parent_id]]
+            links.extend(
+                ItemClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=item_id,
+                    depth=depth,
+                ) for depth, ancestor_id in enumerate(ancestors[item_id])
+            )
+        ItemClosure.objects.bulk_create(links, batch_size=1000)
+        parents = dict(
+            Item.objects.filter(parent__in=list(ancestors)).values_list(
+                'id', 'parent',
+            )
+        )
+        parent_ancestors = ancestors
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(verbose_name='Глубина')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='items.Item', verbose_name='Предок')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='items.Item', verbose_name='Потомок')),
+            ],
+            options={
+                'verbose_name': 'Связь иерархии',
+                'verbose_name_plural': 'Иерархия',
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(fill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.19 on 2026-10-18 06:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_itemclosure'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['item', 'date'], name='history_item_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='history',
+            name='item',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='history', to='items.Item', verbose_name='Элемент'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['type', 'date'], name='item_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['date'], name='item_date_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+TABLE = 'items_history'
+SEQUENCE = 'items_history_id_seq'
+INDEX = 'history_item_date_idx'
+PARTITIONS_AHEAD = 3
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_history(apps, schema_editor):
+    """
+    Переносит историю в таблицу, секционированную по месяцам поля date.
+    Создаются секции для всех имеющихся данных и на несколько месяцев
+    вперед, а также секция по умолчанию.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+    execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_old')
+    execute(
+        f'ALTER TABLE {TABLE}_old '
+        f'RENAME CONSTRAINT {TABLE}_pkey TO {TABLE}_old_pkey'
+    )
+    execute(f'ALTER INDEX {INDEX} RENAME TO {INDEX}_old')
+    execute(f'ALTER SEQUENCE {SEQUENCE} OWNED BY NONE')
+    execute(
+        f'CREATE TABLE {TABLE} ('
+        f'LIKE {TABLE}_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS, '
+        f'PRIMARY KEY (id, date)'
+        f') PARTITION BY RANGE (date)'
+    )
+    execute(
+        f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_item_id_fk '
+        f'FOREIGN KEY (item_id) REFERENCES items_item (id) '
+        f'DEFERRABLE INITIALLY DEFERRED'
+    )
+    execute(f'CREATE INDEX {INDEX} ON {TABLE} (item_id, date)')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(date) FROM {TABLE}_old')
+        first_date = cursor.fetchone()[0] or datetime.now(timezone.utc)
+    first_date = first_date.astimezone(timezone.utc)
+    month = datetime(
+        first_date.year, first_date.month, 1, tzinfo=timezone.utc,
+    )
+    last_month = add_months(datetime.now(timezone.utc), PARTITIONS_AHEAD)
+    while month <= last_month:
+        execute(
+            f'CREATE TABLE {TABLE}_{month:%Y_%m} PARTITION OF {TABLE} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [month, add_months(month, 1)],
+        )
+        month = add_months(month, 1)
+    execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+    execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_old')
+    execute(f'DROP TABLE {TABLE}_old')
+    execute(f'ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+
+
+def unpartition_history(apps, schema_editor):
+    """
+    Возвращает историю в обычную таблицу.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+    execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_partitioned')
+    execute(
+        f'ALTER TABLE {TABLE}_partitioned '
+        f'RENAME CONSTRAINT {TABLE}_pkey TO {TABLE}_partitioned_pkey'
+    )
+    execute(f'ALTER INDEX {INDEX} RENAME TO {INDEX}_partitioned')
+    execute(f'ALTER SEQUENCE {SEQUENCE} OWNED BY NONE')
+    execute(
+        f'CREATE TABLE {TABLE} ('
+        f'LIKE {TABLE}_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS, '
+        f'PRIMARY KEY (id))'
+    )
+    execute(
+        f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_item_id_fk '
+        f'FOREIGN KEY (item_id) REFERENCES items_item (id) '
+        f'DEFERRABLE INITIALLY DEFERRED'
+    )
+    execute(f'CREATE INDEX {INDEX} ON {TABLE} (item_id, date)')
+    execute(f'INSERT INTO {TABLE} SELECT * FROM {TABLE}_partitioned')
+    execute(f'DROP TABLE {TABLE}_partitioned CASCADE')
+    execute(f'ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0003_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_history, unpartition_history),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 2.2.19 on 2026-10-18 07:25
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_aggregates(apps, schema_editor):
+    """
+    Заполняет счетчики, глубину и последнюю дату поддерева существующих
+    элементов по таблице замыкания.
+    """
+    Item = apps.get_model('items', 'Item')
+    ItemClosure = apps.get_model('items', 'ItemClosure')
+    descendants = ItemClosure.objects.filter(
+        ancestor=OuterRef('pk'), depth__gt=0,
+    ).order_by()
+
+    def count(item_type):
+        return Coalesce(Subquery(
+            descendants.filter(descendant__type=item_type).values(
+                'ancestor',
+            ).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ), 0)
+
+    Item.objects.update(
+        depth=Subquery(
+            ItemClosure.objects.filter(
+                descendant=OuterRef('pk'),
+            ).order_by('-depth').values('depth')[:1],
+        ),
+    )
+    Item.objects.filter(type='FOLDER').update(
+        file_count=count('FILE'),
+        folder_count=count('FOLDER'),
+        max_descendant_date=Subquery(
+            descendants.order_by('-descendant__date').values(
+                'descendant__date',
+            )[:1],
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0004_partition_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, verbose_name='Глубина'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Файлов в поддереве'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='folder_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Папок в поддереве'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='max_descendant_date',
+            field=models.DateTimeField(null=True, verbose_name='Последняя дата в поддереве'),
+        ),
+        migrations.RunPython(fill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.19 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0005_item_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropagationJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(verbose_name='Дата импорта')),
+                ('payload', models.TextField(verbose_name='Данные пересчета')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки')),
+            ],
+            options={
+                'verbose_name': 'Задание пересчета',
+                'verbose_name_plural': 'Задания пересчета',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.19 on 2026-10-18 08:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0006_propagationjob'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='item',
+            name='item_date_idx',
+        ),
+    ]
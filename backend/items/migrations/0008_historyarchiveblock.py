@@ -0,0 +1,34 @@
+# Generated by Django 2.2.19 on 2026-10-18 08:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0007_remove_item_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryArchiveBlock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.CharField(max_length=255, verbose_name='Сегмент')),
+                ('offset', models.BigIntegerField(verbose_name='Смещение')),
+                ('length', models.PositiveIntegerField(verbose_name='Длина')),
+                ('first_date', models.DateTimeField(verbose_name='Первая дата')),
+                ('last_date', models.DateTimeField(verbose_name='Последняя дата')),
+                ('item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archive_blocks', to='items.Item', verbose_name='Элемент')),
+            ],
+            options={
+                'verbose_name': 'Блок архива истории',
+                'verbose_name_plural': 'Архив истории',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historyarchiveblock',
+            index=models.Index(fields=['item', 'last_date'], name='archive_item_date_idx'),
+        ),
+    ]
@@ -18,6 +18,16 @@ class Item(models.Model):
     date = models.DateTimeField(verbose_name='Дата')
     url = models.CharField(max_length=255, null=True, verbose_name='Адрес')
     size = models.PositiveIntegerField(null=True, verbose_name='Размер')
+    file_count = models.PositiveIntegerField(
+        default=0, verbose_name='Файлов в поддереве',
+    )
+    folder_count = models.PositiveIntegerField(
+        default=0, verbose_name='Папок в поддереве',
+    )
+    depth = models.PositiveIntegerField(default=0, verbose_name='Глубина')
+    max_descendant_date = models.DateTimeField(
+        null=True, verbose_name='Последняя дата в поддереве',
+    )
     parent = models.ForeignKey(
         'self',
         on_delete=models.CASCADE,
@@ -29,6 +39,9 @@ class Item(models.Model):
     class Meta:
         verbose_name = 'Элемент'
         verbose_name_plural = 'Элементы'
+        indexes = (
+            models.Index(fields=('type', 'date'), name='item_type_date_idx'),
+        )
 
     def __str__(self):
         return f'{self.id}'
@@ -47,12 +60,19 @@ class History(models.Model):
         Item,
         related_name='history',
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Элемент',
     )
 
     class Meta:
         verbose_name = 'История'
         verbose_name_plural = 'История'
+        indexes = (
+            models.Index(
+                fields=('item', 'date'),
+                name='history_item_date_idx',
+            ),
+        )
 
     def __str__(self):
         return (
@@ -61,3 +81,84 @@ class History(models.Model):
             f'size: {self.size}, '
             f'parentId: {self.parent_id}'
         )
+
+
+class HistoryArchiveBlock(models.Model):
+    """
+    Блок архива истории: сжатые записи истории элемента в файле
+    сегмента архива. По блокам архивная история элемента находится
+    без просмотра сегментов, а при удалении элемента удаляется вместе
+    с ним.
+    """
+    item = models.ForeignKey(
+        Item,
+        related_name='archive_blocks',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Элемент',
+    )
+    segment = models.CharField(max_length=255, verbose_name='Сегмент')
+    offset = models.BigIntegerField(verbose_name='Смещение')
+    length = models.PositiveIntegerField(verbose_name='Длина')
+    first_date = models.DateTimeField(verbose_name='Первая дата')
+    last_date = models.DateTimeField(verbose_name='Последняя дата')
+
+    class Meta:
+        verbose_name = 'Блок архива истории'
+        verbose_name_plural = 'Архив истории'
+        indexes = (
+            models.Index(
+                fields=('item', 'last_date'),
+                name='archive_item_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.item_id}: {self.segment} ({self.offset})'
+
+
+class ItemClosure(models.Model):
+    """
+    Таблица замыкания иерархии: связь элемента с каждым его предком
+    (и с самим собой) и расстояние между ними.
+    """
+    ancestor = models.ForeignKey(
+        Item,
+        related_name='descendant_links',
+        on_delete=models.CASCADE,
+        verbose_name='Предок',
+    )
+    descendant = models.ForeignKey(
+        Item,
+        related_name='ancestor_links',
+        on_delete=models.CASCADE,
+        verbose_name='Потомок',
+    )
+    depth = models.PositiveIntegerField(verbose_name='Глубина')
+
+    class Meta:
+        verbose_name = 'Связь иерархии'
+        verbose_name_plural = 'Иерархия'
+        unique_together = ('ancestor', 'descendant')
+
+    def __str__(self):
+        return f'{self.ancestor_id} -> {self.descendant_id} ({self.depth})'
+
+
+class PropagationJob(models.Model):
+    """
+    Отложенный пересчет дат, размеров и истории предков после импорта.
+    Номер задания возвращается клиенту как токен ожидания.
+    """
+    date = models.DateTimeField(verbose_name='Дата импорта')
+    payload = models.TextField(verbose_name='Данные пересчета')
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата постановки',
+    )
+
+    class Meta:
+        verbose_name = 'Задание пересчета'
+        verbose_name_plural = 'Задания пересчета'
+
+    def __str__(self):
+        return f'{self.pk} ({self.date})'
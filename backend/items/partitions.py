@@ -0,0 +1,134 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from django.db import connection, transaction
+
+from .models import History
+
+DEFAULT_PARTITION = '{}_default'
+
+
+def get_month_start(date):
+    """
+    Возвращает начало месяца (UTC), в который попадает дата.
+    """
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+    return datetime(date.year, date.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, count):
+    """
+    Сдвигает начало месяца на count месяцев.
+    """
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def get_partition_name(month):
+    """
+    Возвращает имя секции истории за месяц.
+    """
+    return f'{History._meta.db_table}_{month:%Y_%m}'
+
+
+@lru_cache(maxsize=None)
+def is_history_partitioned():
+    """
+    Проверяет, хранится ли история в секционированной таблице.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = to_regclass(%s)',
+            [History._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_history_partition(month):
+    """
+    Создает секцию истории за месяц, если ее еще нет. Наличие секции
+    проверяет сама база: секцию могут удалить другой процесс или
+    команда history_partitions. Записи месяца, уже попавшие в секцию
+    по умолчанию, переносятся в новую секцию: иначе база не даст ее
+    создать.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(History._meta.db_table)
+    default = quote_name(DEFAULT_PARTITION.format(History._meta.db_table))
+    bounds = [month, add_months(month, 1)]
+    create = (
+        f'CREATE TABLE IF NOT EXISTS '
+        f'{quote_name(get_partition_name(month))} '
+        f'PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)'
+    )
+    in_month = 'WHERE date >= %s AND date < %s'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {default} {in_month})', bounds,
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(create, bounds)
+            return
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default}')
+        cursor.execute(create, bounds)
+        cursor.execute(
+            f'INSERT INTO {table} SELECT * FROM {default} {in_month}', bounds,
+        )
+        cursor.execute(f'DELETE FROM {default} {in_month}', bounds)
+        cursor.execute(
+            f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT',
+        )
+
+
+def ensure_history_partitions(date, months_ahead=0):
+    """
+    Создает секции истории с месяца даты на months_ahead месяцев вперед.
+    Для несекционированной таблицы ничего не делает.
+    """
+    if not is_history_partitioned():
+        return
+    month = get_month_start(date)
+    for offset in range(months_ahead + 1):
+        create_history_partition(add_months(month, offset))
+
+
+def get_history_partitions():
+    """
+    Возвращает список (имя, начало месяца) существующих месячных секций.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s) '
+            'ORDER BY child.relname',
+            [History._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f'{History._meta.db_table}_'
+    partitions = []
+    for name in names:
+        try:
+            month = datetime.strptime(name[len(prefix):], '%Y_%m')
+        except ValueError:
+            continue
+        partitions.append((name, month.replace(tzinfo=timezone.utc)))
+    return partitions
+
+
+def detach_history_partition(name, drop=False):
+    """
+    Отсоединяет секцию истории и при необходимости удаляет ее.
+    """
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'ALTER TABLE {quote_name(History._meta.db_table)} '
+            f'DETACH PARTITION {quote_name(name)}'
+        )
+        if drop:
+            cursor.execute(f'DROP TABLE {quote_name(name)}')
@@ -0,0 +1,16 @@
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ya_disk.settings')
+
+wsgi_application = get_wsgi_application()
+
+from api.asgi import AsyncAPI  # noqa: E402
+from api.cache import check_shared_cache  # noqa: E402
+
+# Число воркеров uvicorn по умолчанию берет из WEB_CONCURRENCY.
+check_shared_cache(int(os.environ.get('WEB_CONCURRENCY', 1)))
+
+application = AsyncAPI(WsgiToAsgi(wsgi_application))
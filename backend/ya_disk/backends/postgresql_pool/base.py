@@ -0,0 +1,80 @@
+import os
+import threading
+
+from django.db.backends.postgresql import base, creation
+
+from .pool import ConnectionPool
+
+# Пулы процесса: {(pid, параметры соединения): ConnectionPool}.
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(conn_params, settings_dict):
+    """
+    Возвращает пул для параметров соединения. Пулы создаются заново
+    в каждом процессе, поэтому не разделяются воркерами после fork.
+    """
+    key = (os.getpid(), tuple(sorted(conn_params.items())))
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None:
+            options = settings_dict.get('POOL', {})
+            pool = pools[key] = ConnectionPool(
+                lambda: base.Database.connect(**conn_params),
+                size=options.get('SIZE', 10),
+                timeout=options.get('TIMEOUT', 10),
+                check_interval=options.get('CHECK_INTERVAL', 30),
+            )
+        return pool
+
+
+def close_pools(database_name=None):
+    """
+    Закрывает свободные соединения пулов (всех или к одной базе).
+    """
+    with pools_lock:
+        selected = [
+            pool for (_, params), pool in pools.items()
+            if database_name is None
+            or dict(params).get('database') == database_name
+        ]
+    for pool in selected:
+        pool.close()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL, берущий соединения из пула процесса. Закрытие
+    соединения (в конце каждого запроса при CONN_MAX_AGE = 0) возвращает
+    его в пул.
+    """
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(conn_params, self.settings_dict)
+        connection = self.pool.acquire()
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
+
+    def get_pool_stats(self):
+        pool = getattr(self, 'pool', None)
+        return pool.get_stats() if pool is not None else None
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2 as Database
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений psycopg2 ограниченного размера.
+    Свободные соединения выдаются в порядке LIFO; соединение, простоявшее
+    дольше check_interval секунд, перед выдачей проверяется запросом
+    SELECT 1. Если свободных соединений нет, запрос ждет до timeout
+    секунд.
+    """
+    def __init__(self, connect, size, timeout=10, check_interval=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.idle = deque()
+        self.opened = 0
+        self.condition = threading.Condition()
+        self.stats = dict.fromkeys(
+            ('checkouts', 'waits', 'timeouts', 'created', 'discarded'), 0,
+        )
+        self.stats['wait_time'] = 0.0
+
+    def acquire(self):
+        started = time.monotonic()
+        waited = False
+        connection = None
+        with self.condition:
+            while True:
+                if self.idle:
+                    connection, released = self.idle.pop()
+                    break
+                if self.opened < self.size:
+                    self.opened += 1
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise Database.OperationalError(
+                        'Нет свободных соединений в пуле'
+                    )
+                waited = True
+                self.condition.wait(remaining)
+            self.stats['checkouts'] += 1
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_time'] += time.monotonic() - started
+        if connection is not None and not self.check(connection, released):
+            self.close_quietly(connection)
+            with self.condition:
+                self.stats['discarded'] += 1
+            connection = None
+        if connection is None:
+            try:
+                connection = self.connect()
+            except Exception:
+                with self.condition:
+                    self.opened -= 1
+                    self.condition.notify()
+                raise
+            with self.condition:
+                self.stats['created'] += 1
+        return connection
+
+    def check(self, connection, released):
+        """
+        Проверка соединения перед выдачей.
+        """
+        if connection.closed:
+            return False
+        if time.monotonic() - released < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def release(self, connection):
+        """
+        Возвращает соединение в пул, откатывая незавершенную транзакцию.
+        Сломанные соединения закрываются.
+        """
+        usable = not connection.closed
+        if (usable and connection.get_transaction_status()
+                != TRANSACTION_STATUS_IDLE):
+            try:
+                connection.rollback()
+            except Database.Error:
+                usable = False
+        with self.condition:
+            if usable:
+                self.idle.append((connection, time.monotonic()))
+            else:
+                self.opened -= 1
+                self.stats['discarded'] += 1
+            self.condition.notify()
+        if not usable:
+            self.close_quietly(connection)
+
+    def close(self):
+        """
+        Закрывает все свободные соединения.
+        """
+        with self.condition:
+            idle = [connection for connection, _ in self.idle]
+            self.idle.clear()
+            self.opened -= len(idle)
+        for connection in idle:
+            self.close_quietly(connection)
+
+    @staticmethod
+    def close_quietly(connection):
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'opened': self.opened,
+                'idle': len(self.idle),
+                'in_use': self.opened - len(self.idle),
+                **self.stats,
+            }
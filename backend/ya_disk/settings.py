@@ -25,6 +25,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,13 +59,30 @@ DATABASES = {
     'default': {
         'ENGINE': os.getenv(
             'DB_ENGINE',
-            default='django.db.backends.postgresql',
+            default='ya_disk.backends.postgresql_pool',
         ),
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
         'PORT': os.getenv('DB_PORT', default='5432'),
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', default=10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+            'CHECK_INTERVAL': float(
+                os.getenv('DB_POOL_CHECK_INTERVAL', default=30),
+            ),
+        },
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
     }
 }
 
@@ -93,6 +111,22 @@ USE_L10N = True
 
 USE_TZ = True
 
+FAST_JSON = os.getenv('FAST_JSON', default='True') == 'True'
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer' if FAST_JSON
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser' if FAST_JSON
+        else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
@@ -100,3 +134,42 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DATE_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+MAX_PAGE_LIMIT = int(os.getenv('MAX_PAGE_LIMIT', default=1000))
+
+NODES_STREAMING = os.getenv('NODES_STREAMING', default=False) == 'True'
+
+HISTORY_PARTITIONS_AHEAD = int(
+    os.getenv('HISTORY_PARTITIONS_AHEAD', default=3),
+)
+
+HISTORY_RETENTION_DAYS = int(
+    os.getenv('HISTORY_RETENTION_DAYS', default=365),
+)
+
+HISTORY_ARCHIVE_DIR = os.getenv(
+    'HISTORY_ARCHIVE_DIR',
+    default=os.path.join(BASE_DIR, 'history_archive'),
+)
+
+NODES_CACHE_ALIAS = 'default'
+
+NODES_CACHE_TIMEOUT = int(os.getenv('NODES_CACHE_TIMEOUT', default=3600))
+
+SERVER_TIMING = os.getenv('SERVER_TIMING', default=False) == 'True'
+
+PROPAGATION_QUEUE = os.getenv('PROPAGATION_QUEUE', default=False) == 'True'
+
+PROPAGATION_BATCH_SIZE = int(
+    os.getenv('PROPAGATION_BATCH_SIZE', default=100),
+)
+
+PROPAGATION_WAIT_TIMEOUT = float(
+    os.getenv('PROPAGATION_WAIT_TIMEOUT', default=5),
+)
+
+IMPORT_GROUP_COMMIT = os.getenv('IMPORT_GROUP_COMMIT', default=False) == 'True'
+
+IMPORT_GROUP_WINDOW = float(os.getenv('IMPORT_GROUP_WINDOW', default=0.005))
+
+IMPORT_GROUP_MAX_SIZE = int(os.getenv('IMPORT_GROUP_MAX_SIZE', default=64))